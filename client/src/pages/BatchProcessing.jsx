@@ -63,12 +63,8 @@ const BatchProcessing = () => {
 
         const formData = new FormData()
         formData.append('file', fileItem.file)
-        const uploadResponse = await axios.post('/api/upload', formData)
-
-        const humanizeResponse = await axios.post('/api/humanize', {
-          text: uploadResponse.data.text,
-          ...parameters
-        })
+        formData.append('parameters', JSON.stringify(parameters))
+        const humanizeResponse = await axios.post('/api/humanize/upload', formData)
 
         const jobId = humanizeResponse.data.job_id
         await pollJobCompletion(jobId, fileItem.id)
@@ -92,7 +88,10 @@ const BatchProcessing = () => {
     return new Promise((resolve, reject) => {
       const interval = setInterval(async () => {
         try {
-          const response = await axios.get(`/api/job/${jobId}`)
+          // Status only: the texts are fetched when the file is downloaded
+          const response = await axios.get(`/api/job/${jobId}`, {
+            params: { fields: 'status,error_message' }
+          })
 
           if (response.data.status === 'completed') {
             clearInterval(interval)
@@ -123,7 +122,9 @@ const BatchProcessing = () => {
 
     for (const file of completedFiles) {
       if (file.jobId) {
-        const response = await axios.get(`/api/job/${file.jobId}`)
+        const response = await axios.get(`/api/job/${file.jobId}`, {
+          params: { fields: 'output_text' }
+        })
         const blob = new Blob([response.data.output_text], { type: 'text/plain' })
         const url = URL.createObjectURL(blob)
         const a = document.createElement('a')
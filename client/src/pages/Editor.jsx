@@ -77,8 +77,17 @@ const Editor = () => {
 
   const fetchStyleProfiles = async () => {
     try {
-      const response = await axios.get('/api/style-profiles')
-      setStyleProfiles(response.data)
+      // Profiles are paginated; follow the cursor header until the last page
+      const profiles = []
+      let cursor = null
+      do {
+        const response = await axios.get('/api/style-profiles', {
+          params: { limit: 100, ...(cursor && { cursor }) }
+        })
+        profiles.push(...response.data)
+        cursor = response.headers['x-next-cursor']
+      } while (cursor)
+      setStyleProfiles(profiles)
     } catch (error) {
       console.error('Failed to fetch style profiles:', error)
     }
@@ -137,12 +146,18 @@ const Editor = () => {
   const pollJobStatus = async (jobId) => {
     const interval = setInterval(async () => {
       try {
-        const response = await axios.get(`/api/job/${jobId}`)
+        // Poll the status alone; the result is fetched once the job completes
+        const response = await axios.get(`/api/job/${jobId}`, {
+          params: { fields: 'status,error_message' }
+        })
 
         if (response.data.status === 'completed') {
-          setOutputText(response.data.output_text)
-          setMetrics(response.data.metrics)
-          setChanges(response.data.changes || [])
+          const result = await axios.get(`/api/job/${jobId}`, {
+            params: { fields: 'output_text,metrics' }
+          })
+          setOutputText(result.data.output_text)
+          setMetrics(result.data.metrics)
+          setChanges(result.data.changes || [])
           setProcessing(false)
           clearInterval(interval)
           toast.success('Text humanized successfully!')
@@ -1,14 +1,19 @@
-from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Form, BackgroundTasks, Header, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, ORJSONResponse
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from pydantic import BaseModel, Field, EmailStr
+from pydantic import BaseModel, Field, EmailStr, ValidationError
 from typing import Optional, List, Dict, Any
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from sqlalchemy import create_engine, Column, String, Float, Integer, DateTime, Boolean, JSON, Text
+from sqlalchemy import Column, String, Float, Integer, DateTime, Boolean, JSON, Text, LargeBinary, Index, func, case, select, update, delete, or_, null
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.orm import aliased
+from sqlalchemy.orm.attributes import set_committed_value
 import os
 import uuid
 import hashlib
@@ -21,6 +26,25 @@ import stripe
 from dotenv import load_dotenv
 import uvicorn
 
+from llm_cache import get_llm_cache
+from llm_resilience import llm_breaker
+from result_cache import get_result_cache, request_key
+from singleflight import get_singleflight
+from profile_cache import get_profile_cache
+from principal_cache import get_principal_cache
+from latency_stats import get_latency_stats
+from text_store import compress_text, decompress_text, preview
+from pagination import page_size, encode_cursor, decode_cursor
+from retention import get_retention_task
+from export import EXPORT_BATCH_SIZE, EXPORT_MEDIA_TYPES, encode_rows, gzip_chunks
+from extraction_cache import get_extraction_cache
+from compression import CompressionMiddleware, compression_stats
+from extraction import get_extractor, spool_upload, UploadTooLarge, ExtractionError, SUPPORTED_EXTENSIONS as SUPPORTED_UPLOAD_TYPES
+from database import (
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, WORKER_DB_POOL_SIZE, WORKER_DB_MAX_OVERFLOW,
+    create_db_engine, pool_stats
+)
+
 load_dotenv()
 
 app = FastAPI(title="NoShitAI API", version="1.0.0")
@@ -38,8 +62,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+# Job and dashboard payloads carry whole documents; streams are left alone
+app.add_middleware(CompressionMiddleware)
+
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./noshitai.db")
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
@@ -48,9 +76,17 @@ STRIPE_SECRET_KEY = os.getenv("STRIPE_SECRET_KEY")
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
+IDEMPOTENCY_WINDOW_HOURS = int(os.getenv("IDEMPOTENCY_WINDOW_HOURS", "24"))
+ADMIN_EMAILS = {e.strip().lower() for e in os.getenv("ADMIN_EMAILS", "").split(",") if e.strip()}
+
+# Objects stay usable after commit; async sessions cannot lazy-load expired attributes
+engine = create_db_engine(DATABASE_URL, "api", DB_POOL_SIZE, DB_MAX_OVERFLOW)
+SessionLocal = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+# Background jobs get their own pool so their updates never wait on request traffic
+worker_engine = create_db_engine(DATABASE_URL, "worker", WORKER_DB_POOL_SIZE, WORKER_DB_MAX_OVERFLOW)
+WorkerSessionLocal = async_sessionmaker(worker_engine, autoflush=False, expire_on_commit=False)
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -58,6 +94,15 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 redis_client = redis.from_url(REDIS_URL, decode_responses=True)
 
+result_cache = get_result_cache()
+singleflight = get_singleflight()
+profile_cache = get_profile_cache()
+principal_cache = get_principal_cache()
+latency_stats = get_latency_stats()
+retention_task = get_retention_task()
+extractor = get_extractor()
+extraction_cache = get_extraction_cache()
+
 celery_app = Celery('tasks', broker=REDIS_URL, backend=REDIS_URL)
 
 if STRIPE_SECRET_KEY:
@@ -90,22 +135,107 @@ class StyleProfile(Base):
     metrics = Column(JSON)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        Index("ix_style_profiles_user_created", "user_id", "created_at"),
+    )
+
 class ProcessingJob(Base):
     __tablename__ = "processing_jobs"
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     user_id = Column(String, index=True)
     status = Column(String, default="pending")
+    # Texts live compressed in text_blobs; these hold jobs stored before that
     input_text = Column(Text)
     output_text = Column(Text)
-    parameters = Column(JSON)
+    input_digest = Column(String(64))
+    output_digest = Column(String(64))
+    input_preview = Column(String(100))
+    parameters = Column(JSON)  # request parameters without the text
     metrics = Column(JSON)
     created_at = Column(DateTime, default=datetime.utcnow)
     completed_at = Column(DateTime)
     error_message = Column(Text)
     watermark_id = Column(String)
+    # Bumped by every ORM update of the row; the job endpoint's ETag
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version}
+
+    # Job history and recent jobs are read newest first per user
+    __table_args__ = (
+        Index("ix_processing_jobs_user_created", "user_id", "created_at"),
+        Index("ix_processing_jobs_created", "created_at"),
+    )
+
+class ArchivedJob(Base):
+    __tablename__ = "archived_jobs"
+
+    # Finished jobs past JOB_RETENTION_DAYS; texts stay in text_blobs
+    id = Column(String, primary_key=True)
+    user_id = Column(String)
+    status = Column(String)
+    input_digest = Column(String(64))
+    output_digest = Column(String(64))
+    input_preview = Column(String(100))
+    parameters = Column(JSON)
+    metrics = Column(JSON)
+    created_at = Column(DateTime)
+    completed_at = Column(DateTime)
+    error_message = Column(Text)
+    watermark_id = Column(String)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_archived_jobs_user_created", "user_id", "created_at"),
+    )
 
-Base.metadata.create_all(bind=engine)
+# Jobs in these states are never touched again and can be archived
+FINISHED_STATUSES = ("completed", "failed")
+
+# What GET /api/job/{job_id}?fields= can select
+JOB_FIELDS = (
+    "id", "status", "archived", "input_text", "output_text", "metrics", "parameters",
+    "created_at", "completed_at", "error_message", "watermark_id"
+)
+
+class TextBlob(Base):
+    __tablename__ = "text_blobs"
+
+    # Content-addressed by the sha256 of the text, so resubmitted documents are stored once
+    digest = Column(String(64), primary_key=True)
+    data = Column(LargeBinary, nullable=False)
+    size = Column(Integer)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    # Composite primary key: replays are a single indexed lookup
+    user_id = Column(String, primary_key=True)
+    key = Column(String, primary_key=True)
+    request_hash = Column(String, nullable=False)
+    job_id = Column(String, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+@app.on_event("startup")
+async def create_tables():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+@app.on_event("startup")
+async def start_retention():
+    if retention_task:
+        retention_task.start(archive_jobs_batch)
+
+@app.on_event("shutdown")
+async def dispose_engines():
+    if retention_task:
+        await retention_task.stop()
+    extractor.shutdown()
+    await engine.dispose()
+    await worker_engine.dispose()
 
 class UserCreate(BaseModel):
     email: EmailStr
@@ -123,6 +253,14 @@ class Token(BaseModel):
 class TokenData(BaseModel):
     email: Optional[str] = None
 
+class Principal(BaseModel):
+    id: str
+    email: str
+    full_name: Optional[str] = None
+    is_premium: bool = False
+    credits: int = 0
+    settings: Optional[Dict[str, Any]] = None
+
 class HumanizeRequest(BaseModel):
     text: str
     tone: str = Field(default="neutral", pattern="^(neutral|casual|formal|persuasive|academic)$")
@@ -145,12 +283,9 @@ class StyleProfileCreate(BaseModel):
     description: Optional[str] = None
     sample_text: str
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
@@ -168,29 +303,72 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
+def credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=401,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def decode_token_email(token: str) -> str:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
         if email is None:
-            raise credentials_exception
+            raise credentials_exception()
         token_data = TokenData(email=email)
     except JWTError:
-        raise credentials_exception
+        raise credentials_exception()
+
+    return token_data.email
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
+    """ORM user, for endpoints that modify it"""
+    email = decode_token_email(token)
 
-    user = db.query(User).filter(User.email == token_data.email).first()
+    user = await db.scalar(select(User).where(User.email == email))
     if user is None:
-        raise credentials_exception
+        raise credentials_exception()
     return user
 
+async def get_current_principal(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> Principal:
+    """Read-only view of the user, cached briefly by token so hot endpoints skip the user query"""
+    # The signature and expiry are always checked; only the lookup is cached
+    email = decode_token_email(token)
+
+    cached = principal_cache.get(token) if principal_cache else None
+    if cached:
+        return Principal(**cached)
+
+    user = await db.scalar(select(User).where(User.email == email))
+    if user is None:
+        raise credentials_exception()
+
+    principal = Principal(
+        id=user.id,
+        email=user.email,
+        full_name=user.full_name,
+        is_premium=user.is_premium,
+        credits=user.credits,
+        settings=user.settings
+    )
+
+    if principal_cache:
+        principal_cache.set(token, principal.dict())
+    return principal
+
+def invalidate_principal(user_id: str):
+    if principal_cache:
+        principal_cache.invalidate_user(user_id)
+
+async def get_admin_principal(current_user: Principal = Depends(get_current_principal)) -> Principal:
+    if current_user.email.lower() not in ADMIN_EMAILS:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return current_user
+
 @app.post("/api/auth/register", response_model=Token)
-async def register(user: UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.email == user.email).first()
+async def register(user: UserCreate, db: AsyncSession = Depends(get_db)):
+    db_user = await db.scalar(select(User).where(User.email == user.email))
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
 
@@ -201,8 +379,7 @@ async def register(user: UserCreate, db: Session = Depends(get_db)):
         full_name=user.full_name
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
 
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
@@ -211,8 +388,8 @@ async def register(user: UserCreate, db: Session = Depends(get_db)):
     return {"access_token": access_token, "token_type": "bearer"}
 
 @app.post("/api/auth/login", response_model=Token)
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == form_data.username).first()
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
+    user = await db.scalar(select(User).where(User.email == form_data.username))
     if not user or not verify_password(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=401,
@@ -221,7 +398,7 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
         )
 
     user.last_login = datetime.utcnow()
-    db.commit()
+    await db.commit()
 
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
@@ -230,7 +407,7 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
     return {"access_token": access_token, "token_type": "bearer"}
 
 @app.get("/api/user/profile")
-async def get_profile(current_user: User = Depends(get_current_user)):
+async def get_profile(current_user: Principal = Depends(get_current_principal)):
     return {
         "id": current_user.id,
         "email": current_user.email,
@@ -240,37 +417,187 @@ async def get_profile(current_user: User = Depends(get_current_user)):
         "settings": current_user.settings
     }
 
-@app.get("/api/user/dashboard")
-async def get_dashboard(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    # Get user's processing statistics
-    jobs = db.query(ProcessingJob).filter(ProcessingJob.user_id == current_user.id).all()
-
-    total_processed = len(jobs)
-    completed_jobs = [j for j in jobs if j.status == "completed"]
-    success_rate = (len(completed_jobs) / total_processed * 100) if total_processed > 0 else 100
-
-    # Get recent jobs
-    recent_jobs = db.query(ProcessingJob).filter(
+@app.get("/api/user/dashboard", response_class=ORJSONResponse)
+async def get_dashboard(current_user: Principal = Depends(get_current_principal), db: AsyncSession = Depends(get_db)):
+    # Get user's processing statistics, counted in the database
+    total_processed, completed = (await db.execute(select(
+        func.count(ProcessingJob.id),
+        func.coalesce(func.sum(case((ProcessingJob.status == "completed", 1), else_=0)), 0)
+    ).where(ProcessingJob.user_id == current_user.id))).one()
+
+    archived_total, archived_completed = (await db.execute(select(
+        func.count(ArchivedJob.id),
+        func.coalesce(func.sum(case((ArchivedJob.status == "completed", 1), else_=0)), 0)
+    ).where(ArchivedJob.user_id == current_user.id))).one()
+    total_processed += archived_total
+    completed += archived_completed
+
+    success_rate = (completed / total_processed * 100) if total_processed > 0 else 100
+
+    # Get recent jobs: only the listed columns and the preview, never the full texts
+    recent_jobs = (await db.execute(select(
+        ProcessingJob.id,
+        ProcessingJob.status,
+        ProcessingJob.created_at,
+        func.coalesce(
+            ProcessingJob.input_preview, func.substr(ProcessingJob.input_text, 1, 100)
+        ).label("preview")
+    ).where(
         ProcessingJob.user_id == current_user.id
-    ).order_by(ProcessingJob.created_at.desc()).limit(5).all()
+    ).order_by(ProcessingJob.created_at.desc()).limit(5))).all()
 
-    return {
+    # All-time latency sketch for the user: one read, no job scan
+    latency = latency_stats.summary(f"user:{current_user.id}") if latency_stats else {}
+
+    return ORJSONResponse({
         "stats": {
             "totalProcessed": total_processed,
             "creditsUsed": 10 - current_user.credits if not current_user.is_premium else 0,
-            "avgProcessingTime": 2.5,  # Placeholder
+            "avgProcessingTime": round(latency['mean'], 1) if latency.get('mean') is not None else 0,
+            "p95ProcessingTime": round(latency['p95'], 1) if latency.get('p95') is not None else 0,
             "successRate": round(success_rate, 1)
         },
         "recent_jobs": [{
             "id": job.id,
-            "input_text": job.input_text[:100] if job.input_text else "",
+            "input_text": job.preview or "",
             "status": job.status,
             "created_at": job.created_at.isoformat() if job.created_at else None
         } for job in recent_jobs]
-    }
+    })
+
+@app.get("/api/jobs", response_class=ORJSONResponse)
+async def list_jobs(
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    archived: bool = False,
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db)
+):
+    """Job history, newest first; pass next_cursor back as cursor for the next page"""
+    if archived:
+        model = ArchivedJob
+        preview_column = ArchivedJob.input_preview
+    else:
+        model = ProcessingJob
+        preview_column = func.coalesce(
+            ProcessingJob.input_preview, func.substr(ProcessingJob.input_text, 1, 100)
+        )
+
+    query = select(
+        model.id,
+        model.status,
+        model.created_at,
+        model.completed_at,
+        preview_column.label("preview")
+    ).where(model.user_id == current_user.id)
+
+    jobs, next_cursor = await fetch_page(db, query, model, limit, cursor)
+
+    return ORJSONResponse({
+        "jobs": [{
+            "id": job.id,
+            "status": job.status,
+            "input_preview": job.preview or "",
+            "created_at": job.created_at,
+            "completed_at": job.completed_at
+        } for job in jobs],
+        "next_cursor": next_cursor
+    })
+
+async def fetch_page(db: AsyncSession, query, model, limit: Optional[int], cursor: Optional[str]):
+    """One page of rows newest first, seeking past the cursor instead of using OFFSET"""
+    limit = page_size(limit)
+
+    if cursor:
+        try:
+            created_at, row_id = decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        # The created_at bound is what the (user_id, created_at) index seeks on; id breaks ties
+        query = query.where(
+            model.created_at <= created_at,
+            or_(model.created_at < created_at, model.id < row_id)
+        )
+
+    rows = (await db.execute(
+        query.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1)
+    )).all()
+
+    if len(rows) <= limit:
+        return rows, None
+
+    last = rows[limit - 1]
+    return rows[:limit], encode_cursor(last.created_at, last.id)
+
+@app.get("/api/jobs/export")
+async def export_jobs(
+    format: str = "ndjson",
+    compress: bool = False,
+    current_user: Principal = Depends(get_current_principal)
+):
+    """Every job of the user with its texts, streamed as NDJSON or CSV"""
+    if format not in EXPORT_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unsupported export format: {format}")
+
+    user_id = current_user.id
+
+    async def rows():
+        # The request session is closed before the body is sent; the export has its own
+        async with SessionLocal() as db:
+            for model in (ProcessingJob, ArchivedJob):
+                result = await db.stream(export_query(model, user_id))
+                async for row in result:
+                    yield {
+                        "id": row.id,
+                        "status": row.status,
+                        "archived": model is ArchivedJob,
+                        "created_at": row.created_at,
+                        "completed_at": row.completed_at,
+                        "input_text": decompress_text(row.input_data) if row.input_data else row.input_text,
+                        "output_text": decompress_text(row.output_data) if row.output_data else row.output_text,
+                        "metrics": row.metrics,
+                        "parameters": row.parameters
+                    }
+
+    body = encode_rows(rows(), format)
+    filename = f"noshitai-jobs.{format}"
+    if compress:
+        body = gzip_chunks(body)
+        filename += ".gz"
+
+    return StreamingResponse(
+        body,
+        media_type="application/gzip" if compress else EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+def export_query(model, user_id: str):
+    """Jobs with their compressed texts, fetched EXPORT_BATCH_SIZE rows at a time from a server-side cursor"""
+    input_blob = aliased(TextBlob)
+    output_blob = aliased(TextBlob)
+    legacy = model is ProcessingJob
+
+    return select(
+        model.id,
+        model.status,
+        model.created_at,
+        model.completed_at,
+        model.metrics,
+        model.parameters,
+        input_blob.data.label("input_data"),
+        output_blob.data.label("output_data"),
+        (model.input_text if legacy else null()).label("input_text"),
+        (model.output_text if legacy else null()).label("output_text")
+    ).outerjoin(
+        input_blob, input_blob.digest == model.input_digest
+    ).outerjoin(
+        output_blob, output_blob.digest == model.output_digest
+    ).where(
+        model.user_id == user_id
+    ).order_by(model.created_at).execution_options(yield_per=EXPORT_BATCH_SIZE)
 
 @app.get("/api/billing/history")
-async def get_billing_history(current_user: User = Depends(get_current_user)):
+async def get_billing_history(current_user: Principal = Depends(get_current_principal)):
     # Placeholder billing history
     return []
 
@@ -278,26 +605,75 @@ async def get_billing_history(current_user: User = Depends(get_current_user)):
 async def humanize_text(
     request: HumanizeRequest,
     background_tasks: BackgroundTasks,
+    idempotency_key: Optional[str] = Header(default=None),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
+    request_hash = None
+    if idempotency_key:
+        # Retried requests get the original job back without charging or running anything
+        request_hash = hashlib.sha256(
+            json.dumps(request.dict(), sort_keys=True, default=str).encode()
+        ).hexdigest()
+        replay = await find_idempotent_job(db, current_user, idempotency_key, request_hash)
+        if replay:
+            return replay
+
+    # Early rejection only; charge_credits is what guards the balance
     if not current_user.is_premium and current_user.credits <= 0:
         raise HTTPException(status_code=402, detail="Insufficient credits")
 
-    job = ProcessingJob(
-        user_id=current_user.id,
-        input_text=request.text,
-        parameters=request.dict(),
-        status="processing"
-    )
-    db.add(job)
+    # Resolved up front so the profile is part of the cache key
+    parameters = request.dict()
+    await resolve_style_profile(db, parameters)
 
-    if not current_user.is_premium:
-        current_user.credits -= 1
+    cache_key = None
+    cached = None
+    if result_cache and result_cache.cacheable(parameters):
+        cache_key = result_cache.key_for(parameters)
+        cached = result_cache.get(cache_key)
+
+    job = await create_job(db, current_user.id, request.dict())
+
+    if cached:
+        # Identical seeded request: complete from cache without charging a credit
+        await complete_job(db, job, cached, parameters)
 
-    db.commit()
+    if idempotency_key:
+        await db.flush()
+        db.add(IdempotencyKey(
+            user_id=current_user.id,
+            key=idempotency_key,
+            request_hash=request_hash,
+            job_id=job.id
+        ))
 
-    background_tasks.add_task(process_humanization, job.id, request.dict())
+    try:
+        if not cached and not current_user.is_premium:
+            # Charged last so the user row is locked only until the commit below
+            await charge_credits(db, current_user)
+        await db.commit()
+    except IntegrityError:
+        # A concurrent request with the same key won; roll back this job and its charge
+        await db.rollback()
+        await db.refresh(current_user)
+        replay = await find_idempotent_job(db, current_user, idempotency_key, request_hash)
+        if replay:
+            return replay
+        raise HTTPException(status_code=409, detail="Request with this Idempotency-Key is in progress")
+
+    if cached:
+        if latency_stats:
+            latency_stats.record_job(current_user.id, "result_cache", 0.0)
+        return {
+            "job_id": job.id,
+            "status": job.status,
+            "credits_remaining": current_user.credits,
+            "cached": True
+        }
+
+    invalidate_principal(current_user.id)
+    background_tasks.add_task(process_humanization, job.id, parameters, cache_key)
 
     return {
         "job_id": job.id,
@@ -305,7 +681,48 @@ async def humanize_text(
         "credits_remaining": current_user.credits
     }
 
-async def process_humanization(job_id: str, parameters: dict):
+async def charge_credits(db: AsyncSession, user: User, amount: int = 1) -> int:
+    """Deduct credits in one conditional UPDATE; concurrent requests cannot overdraw"""
+    remaining = await db.scalar(
+        update(User)
+        .where(User.id == user.id, User.credits >= amount)
+        .values(credits=User.credits - amount)
+        .returning(User.credits)
+        .execution_options(synchronize_session=False)
+    )
+
+    if remaining is None:
+        await db.rollback()
+        raise HTTPException(status_code=402, detail="Insufficient credits")
+
+    set_committed_value(user, 'credits', remaining)
+    return remaining
+
+async def find_idempotent_job(db: AsyncSession, user: User, key: str, request_hash: str) -> Optional[dict]:
+    record = await db.get(IdempotencyKey, (user.id, key))
+
+    if not record:
+        return None
+
+    if record.created_at < datetime.utcnow() - timedelta(hours=IDEMPOTENCY_WINDOW_HOURS):
+        # Outside the replay window the key can be reused
+        await db.delete(record)
+        await db.commit()
+        return None
+
+    if record.request_hash != request_hash:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+
+    status = await db.scalar(select(ProcessingJob.status).where(ProcessingJob.id == record.job_id))
+
+    return {
+        "job_id": record.job_id,
+        "status": status or "unknown",
+        "credits_remaining": user.credits,
+        "replayed": True
+    }
+
+async def process_humanization(job_id: str, parameters: dict, cache_key: Optional[str] = None):
     # Use the EXACT advanced humanizer with T5 models
     try:
         from humanizer_exact import ExactHumanizationEngine as HumanizationEngine
@@ -313,67 +730,341 @@ async def process_humanization(job_id: str, parameters: dict):
         # Fallback if dependencies not available
         from humanizer import HumanizationEngine
 
-    db = SessionLocal()
-    job = db.query(ProcessingJob).filter(ProcessingJob.id == job_id).first()
-
-    try:
-        # If a style profile is specified, merge its parameters
-        if parameters.get('style_profile_id'):
-            profile = db.query(StyleProfile).filter(
-                StyleProfile.id == parameters['style_profile_id']
-            ).first()
-
-            if profile and profile.parameters:
-                # Merge profile parameters with request parameters
-                # Request parameters take precedence
-                profile_params = profile.parameters or {}
-                for key, value in profile_params.items():
-                    if key not in parameters or parameters[key] is None:
-                        parameters[key] = value
-
+    def run_engine():
+        # Style profile parameters were merged in by the endpoint
         engine = HumanizationEngine()
         result = engine.humanize(
             text=parameters['text'],
             **{k: v for k, v in parameters.items() if k != 'text'}
         )
 
-        job.output_text = result['humanized_text']
-        job.metrics = result['metrics']
-        job.status = "completed"
-        job.completed_at = datetime.utcnow()
+        # A result produced without the provider is not what the request would normally get
+        if cache_key and not result.get('llm_fallback'):
+            result_cache.set(cache_key, result)
+        return result
+
+    async with WorkerSessionLocal() as db:
+        job = await db.get(ProcessingJob, job_id)
+
+        started_at = datetime.utcnow()
+        try:
+            # Identical jobs already running (double submits, batch retries) share one engine run
+            result = await singleflight.run(cache_key or request_key(parameters), run_engine)
+
+            await complete_job(db, job, result, parameters)
+            record_latency(job, HumanizationEngine.__module__, started_at)
+
+        except Exception as e:
+            job.status = "failed"
+            job.error_message = str(e)
+
+        await db.commit()
+
+async def resolve_style_profile(db: AsyncSession, parameters: dict):
+    """Merge style profile parameters into the job payload so workers never query profiles"""
+    if not parameters.get('style_profile_id'):
+        return
+
+    profile_id = parameters['style_profile_id']
+    profile_params = profile_cache.get(profile_id) if profile_cache else None
+    if profile_params is None:
+        profile_params = await load_profile_parameters(db, profile_id)
+        if profile_cache and profile_params is not None:
+            profile_cache.set(profile_id, profile_params)
+
+    # Merge profile parameters with request parameters
+    # Request parameters take precedence; profile metrics with no engine argument
+    # (e.g. lexical_diversity) are skipped
+    for key, value in (profile_params or {}).items():
+        if key in HumanizeRequest.model_fields and parameters.get(key) is None:
+            parameters[key] = value
+
+async def load_profile_parameters(db: AsyncSession, profile_id: str) -> Optional[dict]:
+    profile = (await db.execute(
+        select(StyleProfile.parameters).where(StyleProfile.id == profile_id)
+    )).first()
+    if not profile:
+        return None
+    return profile.parameters or {}
+
+def record_latency(job: ProcessingJob, engine_name: str, started_at: Optional[datetime] = None):
+    """Add a completed job's processing time to the user, engine and stage sketches"""
+    if not latency_stats or not job.created_at or not job.completed_at:
+        return
+
+    stages = {}
+    if started_at:
+        stages = {
+            'queue': (started_at - job.created_at).total_seconds(),
+            'engine': (job.completed_at - started_at).total_seconds()
+        }
+
+    latency_stats.record_job(
+        job.user_id, engine_name, (job.completed_at - job.created_at).total_seconds(), stages
+    )
+
+async def create_job(db: AsyncSession, user_id: str, parameters: dict) -> ProcessingJob:
+    """New processing job; the text is stored once, compressed, instead of in every column"""
+    job = ProcessingJob(
+        user_id=user_id,
+        input_digest=await store_text(db, parameters['text']),
+        input_preview=preview(parameters['text']),
+        parameters={k: v for k, v in parameters.items() if k != 'text'},
+        status="processing",
+        # Set now rather than at flush, so a job completed before its insert keeps created_at <= completed_at
+        created_at=datetime.utcnow()
+    )
+    db.add(job)
+    return job
+
+async def store_text(db: AsyncSession, text: str) -> str:
+    digest, data = compress_text(text)
+
+    # Only the key is selected: the stored blob is not loaded into the session
+    if await db.scalar(select(TextBlob.digest).where(TextBlob.digest == digest)) is None:
+        try:
+            async with db.begin_nested():
+                db.add(TextBlob(digest=digest, data=data, size=len(text)))
+        except IntegrityError:
+            # Stored concurrently by another job
+            pass
+
+    return digest
+
+async def load_job_texts(db: AsyncSession, job: ProcessingJob) -> Dict[str, Optional[str]]:
+    """Decompressed input and output text of a job"""
+    digests = [d for d in (job.input_digest, job.output_digest) if d]
+    blobs = {}
+    if digests:
+        rows = (await db.execute(
+            select(TextBlob.digest, TextBlob.data).where(TextBlob.digest.in_(digests))
+        )).all()
+        blobs = {row.digest: decompress_text(row.data) for row in rows}
+
+    return {
+        'input_text': blobs.get(job.input_digest, getattr(job, 'input_text', None)),
+        'output_text': blobs.get(job.output_digest, getattr(job, 'output_text', None))
+    }
+
+async def archive_jobs_batch(cutoff: datetime, batch_size: int) -> int:
+    """Move up to batch_size finished jobs created before cutoff to archived_jobs"""
+    async with WorkerSessionLocal() as db:
+        # SKIP LOCKED lets a pass run alongside job updates without waiting on them
+        jobs = (await db.scalars(
+            select(ProcessingJob)
+            .where(ProcessingJob.created_at < cutoff, ProcessingJob.status.in_(FINISHED_STATUSES))
+            .order_by(ProcessingJob.created_at)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )).all()
+
+        if not jobs:
+            return 0
+
+        for job in jobs:
+            # Jobs stored before text_blobs carry their texts inline
+            input_digest = job.input_digest
+            if input_digest is None and job.input_text is not None:
+                input_digest = await store_text(db, job.input_text)
+            output_digest = job.output_digest
+            if output_digest is None and job.output_text is not None:
+                output_digest = await store_text(db, job.output_text)
+
+            db.add(ArchivedJob(
+                id=job.id,
+                user_id=job.user_id,
+                status=job.status,
+                input_digest=input_digest,
+                output_digest=output_digest,
+                input_preview=job.input_preview or preview(job.input_text or ""),
+                parameters=job.parameters,
+                metrics=job.metrics,
+                created_at=job.created_at,
+                completed_at=job.completed_at,
+                error_message=job.error_message,
+                watermark_id=job.watermark_id,
+                # The response gains "archived": true, so its ETag must change
+                version=(job.version or 1) + 1
+            ))
+
+        await db.flush()
+        await db.execute(
+            delete(ProcessingJob)
+            .where(ProcessingJob.id.in_([job.id for job in jobs]))
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        return len(jobs)
+
+async def complete_job(db: AsyncSession, job: ProcessingJob, result: dict, parameters: dict):
+    job.output_digest = await store_text(db, result['humanized_text'])
+    job.metrics = result['metrics']
+    job.status = "completed"
+    job.completed_at = datetime.utcnow()
 
-        if parameters.get('integrity_mode') == 'academic':
-            job.watermark_id = generate_watermark(result['humanized_text'])
+    if parameters.get('integrity_mode') == 'academic':
+        job.watermark_id = generate_watermark(result['humanized_text'])
 
+@app.post("/api/humanize/stream")
+async def humanize_text_stream(
+    request: HumanizeRequest,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    if not OPENAI_API_KEY:
+        raise HTTPException(status_code=503, detail="Streaming requires the OpenAI engine")
+
+    if not current_user.is_premium and current_user.credits <= 0:
+        raise HTTPException(status_code=402, detail="Insufficient credits")
+
+    job = await create_job(db, current_user.id, request.dict())
+
+    if not current_user.is_premium:
+        await charge_credits(db, current_user)
+
+    await db.commit()
+    invalidate_principal(current_user.id)
+
+    job_id = job.id
+    credits_remaining = current_user.credits
+    parameters = request.dict()
+    await resolve_style_profile(db, parameters)
+
+    refund = not current_user.is_premium
+    user_id = current_user.id
+
+    async def event_stream():
+        try:
+            yield format_sse("job", {"job_id": job_id, "credits_remaining": credits_remaining})
+
+            # The request session is closed once the response starts; the stream has its own
+            async with WorkerSessionLocal() as stream_db:
+                stream_job = await stream_db.get(ProcessingJob, job_id)
+                started_at = datetime.utcnow()
+
+                try:
+                    # Importing and constructing the engine loads NLTK and spaCy data
+                    engine = await run_in_threadpool(build_stream_engine)
+                    # The engine blocks on the provider, so it is iterated in the threadpool
+                    async for event in iterate_in_threadpool(engine.humanize_stream(
+                        text=parameters['text'],
+                        **{k: v for k, v in parameters.items() if k != 'text'}
+                    )):
+                        if event['type'] == 'delta':
+                            yield format_sse("delta", {"content": event['content']})
+                            continue
+
+                        # Final pass: restored and watermarked text replaces the streamed preview
+                        await complete_job(stream_db, stream_job, event['result'], parameters)
+                        await stream_db.commit()
+                        record_latency(stream_job, "humanizer_openai", started_at)
+                        yield format_sse("result", {
+                            "job_id": job_id,
+                            "status": stream_job.status,
+                            "output_text": event['result']['humanized_text'],
+                            "metrics": stream_job.metrics,
+                            "watermark_id": stream_job.watermark_id
+                        })
+
+                except Exception as e:
+                    stream_job.status = "failed"
+                    stream_job.error_message = str(e)
+                    await stream_db.commit()
+                    yield format_sse("error", {"job_id": job_id, "detail": str(e)})
+
+        except BaseException:
+            # Client disconnected: the stream is cancelled, so the cleanup runs as its own task
+            task = asyncio.get_running_loop().create_task(abandon_stream_job(job_id, user_id, refund))
+            abandoned_streams.add(task)
+            task.add_done_callback(abandoned_streams.discard)
+            raise
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def build_stream_engine():
+    from humanizer_openai import HumanizationEngine
+    return HumanizationEngine()
+
+# Cleanup tasks for cancelled streams, referenced until they finish
+abandoned_streams = set()
+
+async def abandon_stream_job(job_id: str, user_id: str, refund: bool):
+    """Fail a streamed job whose client went away and give its credit back"""
+    try:
+        async with WorkerSessionLocal() as db:
+            # Only a job that is still processing; one completed before the disconnect is kept
+            failed = await db.execute(
+                update(ProcessingJob)
+                .where(ProcessingJob.id == job_id, ProcessingJob.status == "processing")
+                .values(status="failed", error_message="Client disconnected", version=ProcessingJob.version + 1)
+                .execution_options(synchronize_session=False)
+            )
+            if failed.rowcount and refund:
+                await db.execute(
+                    update(User)
+                    .where(User.id == user_id)
+                    .values(credits=User.credits + 1)
+                    .execution_options(synchronize_session=False)
+                )
+            await db.commit()
     except Exception as e:
-        job.status = "failed"
-        job.error_message = str(e)
+        print(f"Failed to clean up streamed job {job_id}: {e}")
+        return
+
+    invalidate_principal(user_id)
 
-    db.commit()
-    db.close()
+def format_sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
 
 def generate_watermark(text: str) -> str:
     return hashlib.sha256(f"{text}{datetime.utcnow()}".encode()).hexdigest()[:16]
 
-@app.get("/api/job/{job_id}")
+@app.get("/api/job/{job_id}", response_class=ORJSONResponse)
 async def get_job_status(
     job_id: str,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    request: Request,
+    fields: Optional[str] = None,
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db)
 ):
-    job = db.query(ProcessingJob).filter(
+    selected = JOB_FIELDS
+    if fields:
+        selected = tuple(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+        unknown = [f for f in selected if f not in JOB_FIELDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+
+    # Jobs past the retention age are served from the archive
+    model = ProcessingJob
+    version = await db.scalar(select(ProcessingJob.version).where(
         ProcessingJob.id == job_id,
         ProcessingJob.user_id == current_user.id
-    ).first()
-
-    if not job:
+    ))
+    if version is None:
+        model = ArchivedJob
+        version = await db.scalar(select(ArchivedJob.version).where(
+            ArchivedJob.id == job_id,
+            ArchivedJob.user_id == current_user.id
+        ))
+
+    if version is None:
         raise HTTPException(status_code=404, detail="Job not found")
 
-    return {
+    # Unchanged polls are answered from the version alone, without loading the job
+    etag = job_etag(version, selected)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    job = await db.get(model, job_id)
+    values = {
         "id": job.id,
         "status": job.status,
-        "input_text": job.input_text,
-        "output_text": job.output_text,
+        "archived": model is ArchivedJob,
         "metrics": job.metrics,
         "parameters": job.parameters,
         "created_at": job.created_at,
@@ -381,12 +1072,28 @@ async def get_job_status(
         "error_message": job.error_message,
         "watermark_id": job.watermark_id
     }
+    if "input_text" in selected or "output_text" in selected:
+        values.update(await load_job_texts(db, job))
+
+    # orjson writes datetimes and NumPy scalars in metrics natively, without jsonable_encoder
+    return ORJSONResponse({field: values[field] for field in selected}, headers=headers)
+
+def job_etag(version: int, fields) -> str:
+    # Weak: compression changes the bytes, not the representation
+    selection = hashlib.sha256(",".join(fields).encode()).hexdigest()[:8]
+    return f'W/"{version}-{selection}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or etag[2:] in candidates
 
 @app.post("/api/style-profiles")
 async def create_style_profile(
     profile: StyleProfileCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db)
 ):
     # Use OpenAI-powered analyzer if API key is available
     if os.getenv('OPENAI_API_KEY'):
@@ -413,8 +1120,10 @@ async def create_style_profile(
         parameters=parameters
     )
     db.add(db_profile)
-    db.commit()
-    db.refresh(db_profile)
+    await db.commit()
+
+    if profile_cache:
+        profile_cache.set(db_profile.id, parameters)
 
     return {
         "id": db_profile.id,
@@ -424,72 +1133,134 @@ async def create_style_profile(
         "created_at": db_profile.created_at
     }
 
-@app.get("/api/style-profiles")
+@app.get("/api/style-profiles", response_class=ORJSONResponse)
 async def list_style_profiles(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db)
 ):
-    profiles = db.query(StyleProfile).filter(
-        StyleProfile.user_id == current_user.id
-    ).all()
-
-    return [{
+    # Listed columns only: sample_text and parameters are not needed here
+    query = select(
+        StyleProfile.id,
+        StyleProfile.name,
+        StyleProfile.description,
+        StyleProfile.metrics,
+        StyleProfile.created_at
+    ).where(StyleProfile.user_id == current_user.id)
+
+    profiles, next_cursor = await fetch_page(db, query, StyleProfile, limit, cursor)
+
+    return ORJSONResponse([{
         "id": p.id,
         "name": p.name,
         "description": p.description,
         "metrics": p.metrics,
         "created_at": p.created_at
-    } for p in profiles]
+    } for p in profiles], headers={"X-Next-Cursor": next_cursor} if next_cursor else None)
 
 @app.delete("/api/style-profiles/{profile_id}")
 async def delete_style_profile(
     profile_id: str,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db)
 ):
-    profile = db.query(StyleProfile).filter(
+    profile = await db.scalar(select(StyleProfile).where(
         StyleProfile.id == profile_id,
         StyleProfile.user_id == current_user.id
-    ).first()
+    ))
 
     if not profile:
         raise HTTPException(status_code=404, detail="Profile not found")
 
-    db.delete(profile)
-    db.commit()
+    await db.delete(profile)
+    await db.commit()
+
+    if profile_cache:
+        profile_cache.invalidate(profile_id)
+
     return {"message": "Profile deleted successfully"}
 
 @app.post("/api/upload")
 async def upload_file(
     file: UploadFile = File(...),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
-    if file.size > 10 * 1024 * 1024:
-        raise HTTPException(status_code=413, detail="File too large")
+    upload = await receive_upload(file)
+    try:
+        text = await extract_upload(upload)
+    finally:
+        upload.cleanup()
 
-    content = await file.read()
-
-    if file.filename.endswith('.txt'):
-        text = content.decode('utf-8')
-    elif file.filename.endswith('.docx'):
-        from docx import Document
-        import io
-        doc = Document(io.BytesIO(content))
-        text = '\n'.join([p.text for p in doc.paragraphs])
-    elif file.filename.endswith('.pdf'):
-        import PyPDF2
-        import io
-        pdf = PyPDF2.PdfReader(io.BytesIO(content))
-        text = '\n'.join([page.extract_text() for page in pdf.pages])
-    else:
+    return {"text": text}
+
+@app.post("/api/humanize/upload")
+async def humanize_upload(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    parameters: str = Form("{}"),
+    include_text: bool = Form(False),
+    idempotency_key: Optional[str] = Header(default=None),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Extract an uploaded document and start its humanization job in one request"""
+    # Parameters are validated before the file is read, so bad requests fail fast
+    try:
+        fields = json.loads(parameters)
+        if not isinstance(fields, dict):
+            raise ValueError("parameters must be a JSON object")
+        request = HumanizeRequest(text="", **{k: v for k, v in fields.items() if k != 'text'})
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=json.loads(e.json()))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid parameters: {e}")
+
+    upload = await receive_upload(file)
+    try:
+        text = await extract_upload(upload)
+    finally:
+        upload.cleanup()
+
+    result = await humanize_text(
+        request.model_copy(update={'text': text}), background_tasks, idempotency_key, current_user, db
+    )
+
+    # The extracted text only crosses the wire again when asked for
+    if include_text:
+        result = {**result, "text": text}
+    return result
+
+async def receive_upload(file: UploadFile):
+    """Spool the upload to disk, hashing it on the way; never holds the whole file in memory"""
+    if not file.filename or not file.filename.lower().endswith(SUPPORTED_UPLOAD_TYPES):
         raise HTTPException(status_code=400, detail="Unsupported file type")
 
-    return {"text": text}
+    try:
+        return await spool_upload(file)
+    except UploadTooLarge:
+        raise HTTPException(status_code=413, detail="File too large")
+
+async def extract_upload(upload) -> str:
+    # Re-uploads of the same file are served from the cache without parsing it again
+    if extraction_cache:
+        text = await asyncio.to_thread(extraction_cache.get, upload.sha256)
+        if text is not None:
+            return text
+
+    try:
+        text = await extractor.extract_text(upload)
+    except ExtractionError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if extraction_cache:
+        await asyncio.to_thread(extraction_cache.set, upload.sha256, text)
+    return text
 
 @app.post("/api/billing/subscribe")
 async def create_subscription(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     if not STRIPE_SECRET_KEY:
         raise HTTPException(status_code=503, detail="Billing not configured")
@@ -500,7 +1271,7 @@ async def create_subscription(
             name=current_user.full_name
         )
         current_user.stripe_customer_id = customer.id
-        db.commit()
+        await db.commit()
 
     checkout_session = stripe.checkout.Session.create(
         customer=current_user.stripe_customer_id,
@@ -517,21 +1288,58 @@ async def create_subscription(
     return {"checkout_url": checkout_session.url}
 
 @app.post("/api/webhook/stripe")
-async def stripe_webhook(request: dict, db: Session = Depends(get_db)):
+async def stripe_webhook(request: dict, db: AsyncSession = Depends(get_db)):
     if request['type'] == 'checkout.session.completed':
         session = request['data']['object']
         customer_id = session['customer']
 
-        user = db.query(User).filter(
+        user = await db.scalar(select(User).where(
             User.stripe_customer_id == customer_id
-        ).first()
+        ))
 
         if user:
             user.is_premium = True
-            db.commit()
+            await db.commit()
+            invalidate_principal(user.id)
 
     return {"status": "success"}
 
+@app.get("/api/admin/latency")
+async def get_admin_latency(
+    hours: Optional[int] = None,
+    user_id: Optional[str] = None,
+    admin: Principal = Depends(get_admin_principal)
+):
+    if not latency_stats:
+        raise HTTPException(status_code=503, detail="Latency statistics are disabled")
+
+    stats = {
+        "hours": hours,
+        "engines": latency_stats.summaries("engine", hours),
+        "stages": latency_stats.summaries("stage", hours)
+    }
+    if user_id:
+        stats["user"] = latency_stats.summary(f"user:{user_id}", hours)
+    return stats
+
+@app.get("/api/metrics")
+async def get_metrics():
+    llm_cache = get_llm_cache()
+    return {
+        "llm_cache": llm_cache.stats() if llm_cache else None,
+        "llm_breaker": llm_breaker.stats(),
+        "result_cache": result_cache.stats() if result_cache else None,
+        "singleflight": singleflight.stats(),
+        "profile_cache": profile_cache.stats() if profile_cache else None,
+        "principal_cache": principal_cache.stats() if principal_cache else None,
+        "db_pool": pool_stats(engine),
+        "worker_db_pool": pool_stats(worker_engine),
+        "retention": retention_task.stats() if retention_task else None,
+        "extraction": extractor.stats(),
+        "extraction_cache": extraction_cache.stats() if extraction_cache else None,
+        "compression": compression_stats.stats()
+    }
+
 @app.get("/")
 async def root():
     return {"name": "NoShitAI API", "version": "1.0.0"}
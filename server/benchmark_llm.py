@@ -0,0 +1,201 @@
+"""Throughput and tail-latency benchmark for the LLM engines.
+
+    python benchmark_llm.py --start-server --engines pro,ultimate --requests 50 --concurrency 8
+
+With --start-server the fake OpenAI server is launched locally and the engines
+are pointed at it, so no tokens are spent and no network is needed.
+
+--compare-fused runs the two-pass engines (pro, ultimate, advanced) twice, once
+with a completion per pass and once with both passes fused into one call, and
+reports latency next to the engines' own human score for each mode.
+
+The cover column is the share of the input's words still in the output. A run
+below MIN_INPUT_COVERAGE did not rewrite the whole document, and its human
+score is not reported.
+"""
+import os
+import sys
+import time
+import socket
+import argparse
+import subprocess
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+SAMPLE_PARAGRAPH = (
+    "Furthermore, it is important to note that the landscape of modern software development "
+    "is evolving rapidly. Teams leverage cutting-edge tools to streamline their workflows, and "
+    "they are able to deliver robust solutions in order to meet the needs of their users (Smith, 2021). "
+    "However, it is not always easy to maintain quality while moving quickly."
+)
+
+def build_text(words: int) -> str:
+    paragraphs = []
+    while sum(len(p.split()) for p in paragraphs) < words:
+        paragraphs.append(SAMPLE_PARAGRAPH)
+    return "\n\n".join(paragraphs)
+
+# Engines that make two completions per request unless their passes are fused
+TWO_PASS_ENGINES = ["pro", "ultimate", "advanced"]
+
+def build_engines(names: List[str], fused: Optional[bool] = None) -> Dict[str, Callable[[str], object]]:
+    engines = {}
+    for name in names:
+        if name == "pro":
+            from humanizer_pro import ProHumanizationEngine
+            engine = ProHumanizationEngine(fused_passes=fused)
+            engines[name] = lambda text, e=engine: e.humanize(text)
+        elif name == "ultimate":
+            from humanizer_ultimate import UltimateHumanizationEngine
+            engine = UltimateHumanizationEngine(fused_passes=fused)
+            engines[name] = lambda text, e=engine: e.humanize(text)
+        elif name == "advanced":
+            from humanizer_advanced import AdvancedHumanizationEngine
+            engine = AdvancedHumanizationEngine(fused_passes=fused)
+            engines[name] = lambda text, e=engine: e.humanize(text)
+        elif name == "openai":
+            from humanizer_openai import HumanizationEngine
+            engine = HumanizationEngine()
+            engines[name] = lambda text, e=engine: e.humanize(text)
+        elif name == "exact":
+            from humanizer_exact import ExactHumanizationEngine
+            engine = ExactHumanizationEngine()
+            engines[name] = lambda text, e=engine: e.apply_chatgpt_parameters(
+                text, 'neutral', 0.5, 0.5, 50, 0.3, 0.5, 0.7
+            )
+        else:
+            raise ValueError(f"Unknown engine: {name}")
+    return engines
+
+# Below this share of the input's words the engine did not rewrite the whole document
+# (e.g. the model was sent or returned only part of it), so its human score is not reported
+MIN_INPUT_COVERAGE = 0.6
+
+def output_text(result: object) -> str:
+    return result.get('humanized_text', '') if isinstance(result, dict) else str(result or '')
+
+def input_coverage(text: str, output: str) -> float:
+    """Share of the input's words that are still in the output, counting repeats"""
+    words = Counter(text.lower().split())
+    kept = Counter(output.lower().split())
+    return sum(min(count, kept[word]) for word, count in words.items()) / max(1, sum(words.values()))
+
+def quality_score(result: object) -> Optional[float]:
+    """Human score (0-100) an engine reports for its own output"""
+    metrics = result.get('metrics', {}) if isinstance(result, dict) else {}
+    if 'human_score' in metrics:
+        return float(metrics['human_score'])
+    if 'ai_detection_probability' in metrics:
+        return (1 - float(metrics['ai_detection_probability'])) * 100
+    return None
+
+def run_benchmark(run: Callable[[str], object], text: str, requests: int, concurrency: int) -> Dict:
+    latencies = []
+    scores = []
+    coverages = []
+    errors = 0
+
+    def timed(_):
+        start = time.perf_counter()
+        result = run(text)
+        return time.perf_counter() - start, quality_score(result), input_coverage(text, output_text(result))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(timed, i) for i in range(requests)]
+        for future in futures:
+            try:
+                latency, score, coverage = future.result()
+                latencies.append(latency)
+                coverages.append(coverage)
+                if score is not None:
+                    scores.append(score)
+            except Exception as e:
+                print(f"Request failed: {e}")
+                errors += 1
+    elapsed = time.perf_counter() - started
+
+    if not latencies:
+        return {'requests': requests, 'errors': errors}
+
+    return {
+        'requests': requests,
+        'errors': errors,
+        'throughput': len(latencies) / elapsed,
+        'mean': float(np.mean(latencies)),
+        'p50': float(np.percentile(latencies, 50)),
+        'p95': float(np.percentile(latencies, 95)),
+        'p99': float(np.percentile(latencies, 99)),
+        'coverage': float(np.mean(coverages)),
+        'human_score': float(np.mean(scores)) if scores else None,
+    }
+
+def start_fake_server(port: int) -> subprocess.Popen:
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_openai_server.py"),
+         "--port", str(port)]
+    )
+
+    # Wait for the port to accept connections
+    for _ in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            break
+        except OSError:
+            time.sleep(0.1)
+
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{port}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "fake")
+    return server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the LLM humanization engines")
+    parser.add_argument("--engines", default="pro,ultimate,advanced,exact")
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--words", type=int, default=300)
+    parser.add_argument("--start-server", action="store_true")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--compare-fused", action="store_true",
+                        help="run the two-pass engines with and without fused passes")
+    args = parser.parse_args()
+
+    server = start_fake_server(args.port) if args.start_server else None
+
+    try:
+        text = build_text(args.words)
+
+        if args.compare_fused:
+            names = [n for n in args.engines.split(",") if n in TWO_PASS_ENGINES] or TWO_PASS_ENGINES
+            runs = []
+            for name in names:
+                runs.append((f"{name}", build_engines([name], fused=False)[name]))
+                runs.append((f"{name}+fused", build_engines([name], fused=True)[name]))
+        else:
+            runs = list(build_engines(args.engines.split(",")).items())
+
+        print(f"{'engine':<15} {'ok':>5} {'err':>5} {'req/s':>8} {'mean':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'cover':>6} {'human':>6}")
+        for name, run in runs:
+            result = run_benchmark(run, text, args.requests, args.concurrency)
+            if 'mean' not in result:
+                print(f"{name:<15} {0:>5} {result['errors']:>5}")
+                continue
+            complete = result['coverage'] >= MIN_INPUT_COVERAGE
+            if complete and result['human_score'] is not None:
+                human = f"{result['human_score']:>6.1f}"
+            else:
+                human = f"{'-':>6}"
+            print(
+                f"{name:<15} {result['requests'] - result['errors']:>5} {result['errors']:>5} "
+                f"{result['throughput']:>8.2f} {result['mean']:>7.2f}s {result['p50']:>7.2f}s "
+                f"{result['p95']:>7.2f}s {result['p99']:>7.2f}s {result['coverage']:>6.2f} {human}"
+            )
+            if not complete:
+                print(f"  {name}: output kept {result['coverage']:.0%} of the input, so it is not a rewrite "
+                      f"of the whole document; human score not reported")
+    finally:
+        if server:
+            server.terminate()
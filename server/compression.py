@@ -0,0 +1,124 @@
+import os
+import gzip
+import asyncio
+from typing import Dict, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+# Bodies above this many bytes are compressed in a thread instead of on the event loop
+COMPRESSION_THREAD_SIZE = 256 * 1024
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+
+# Streams (SSE, exports) are sent as produced and never buffered for compression
+SKIPPED_MEDIA_TYPES = ("text/event-stream", "application/gzip", "application/x-ndjson", "text/csv")
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    accepted = {part.split(";")[0].strip().lower() for part in accept_encoding.split(",")}
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+class CompressionStats:
+    """Counters shared by every middleware instance, reported in /api/metrics"""
+
+    def __init__(self):
+        self.counts: Dict[str, int] = {"br": 0, "gzip": 0, "identity": 0}
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def stats(self) -> Dict:
+        return {
+            'brotli': brotli is not None,
+            'responses': dict(self.counts),
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'ratio': round(self.bytes_out / self.bytes_in, 4) if self.bytes_in else None
+        }
+
+compression_stats = CompressionStats()
+
+class CompressionMiddleware:
+    """Brotli or gzip for complete responses of at least minimum_size bytes"""
+
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.stats = compression_stats
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Message] = None
+        passthrough = False
+
+        async def send_compressed(message: Message):
+            nonlocal start, passthrough
+
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                media_type = headers.get("content-type", "").split(";")[0]
+                if "content-encoding" in headers or media_type in SKIPPED_MEDIA_TYPES:
+                    passthrough = True
+                    await send(message)
+                else:
+                    # Held back until the body shows whether compressing is worth it
+                    start = message
+                return
+
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            if start is None:
+                await send(message)
+                return
+
+            if message.get("more_body", False) or len(body) < self.minimum_size:
+                # Streamed or small bodies go out as they are
+                self.stats.counts["identity"] += 1
+                passthrough = True
+                await send(start)
+                start = None
+                await send(message)
+                return
+
+            if len(body) > COMPRESSION_THREAD_SIZE:
+                compressed = await asyncio.to_thread(compress, body, encoding)
+            else:
+                compressed = compress(body, encoding)
+            self.stats.counts[encoding] += 1
+            self.stats.bytes_in += len(body)
+            self.stats.bytes_out += len(compressed)
+
+            headers = MutableHeaders(raw=start["headers"])
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+            await send(start)
+            start = None
+            await send({"type": "http.response.body", "body": compressed, "more_body": False})
+
+        await self.app(scope, receive, send_compressed)
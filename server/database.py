@@ -0,0 +1,95 @@
+import os
+import threading
+from typing import Dict
+
+import orjson
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+# API request pool
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+# Background job pool, sized separately so job updates never queue behind requests
+WORKER_DB_POOL_SIZE = int(os.getenv("WORKER_DB_POOL_SIZE", "5"))
+WORKER_DB_MAX_OVERFLOW = int(os.getenv("WORKER_DB_MAX_OVERFLOW", "5"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+# Sync URLs in .env keep working; they are mapped to the matching async driver
+ASYNC_DRIVERS = {
+    "postgres": "postgresql+asyncpg",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def async_database_url(url: str) -> str:
+    scheme, separator, rest = url.partition("://")
+    return ASYNC_DRIVERS.get(scheme, scheme) + separator + rest
+
+_metrics: Dict[int, "PoolMetrics"] = {}
+
+class PoolMetrics:
+    """Connection and checkout counters for one engine's pool"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.connects = 0
+        self.checkouts = 0
+        self.invalidated = 0
+        self.lock = threading.Lock()
+
+    def attach(self, engine: AsyncEngine):
+        sync_engine = engine.sync_engine
+        event.listen(sync_engine, "connect", lambda *args: self._count('connects'))
+        event.listen(sync_engine.pool, "checkout", lambda *args: self._count('checkouts'))
+        event.listen(sync_engine.pool, "invalidate", lambda *args: self._count('invalidated'))
+
+    def _count(self, field: str):
+        with self.lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def stats(self, engine: AsyncEngine) -> Dict:
+        pool = engine.sync_engine.pool
+        stats = {
+            'pool': type(pool).__name__,
+            'connects': self.connects,
+            'checkouts': self.checkouts,
+            'invalidated': self.invalidated
+        }
+        # Only queue pools report sizing
+        for name in ('size', 'checkedin', 'checkedout', 'overflow'):
+            value = getattr(pool, name, None)
+            if callable(value):
+                stats[name] = value()
+        return stats
+
+def json_serializer(value) -> str:
+    # Engine metrics may hold NumPy scalars; orjson writes them without conversion
+    return orjson.dumps(value, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS).decode()
+
+def create_db_engine(url: str, name: str, pool_size: int, max_overflow: int) -> AsyncEngine:
+    url = async_database_url(url)
+    json_options = {'json_serializer': json_serializer, 'json_deserializer': orjson.loads}
+
+    if url.startswith("sqlite"):
+        # SQLite is a local file; there is no server pool to size
+        engine = create_async_engine(url, **json_options)
+    else:
+        engine = create_async_engine(
+            url,
+            **json_options,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_pre_ping=True
+        )
+
+    metrics = PoolMetrics(name)
+    metrics.attach(engine)
+    _metrics[id(engine)] = metrics
+    return engine
+
+def pool_stats(engine: AsyncEngine) -> Dict:
+    return _metrics[id(engine)].stats(engine)
@@ -0,0 +1,59 @@
+import io
+import os
+import csv
+import json
+import zlib
+from typing import AsyncIterator, Dict
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+# Rows are buffered into chunks of about this many bytes before they are sent
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "65536"))
+
+EXPORT_FIELDS = [
+    "id", "status", "archived", "created_at", "completed_at",
+    "input_text", "output_text", "metrics", "parameters"
+]
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+def ndjson_line(row: Dict) -> str:
+    return json.dumps(row, default=str) + "\n"
+
+def csv_line(row: Dict) -> str:
+    buffer = io.StringIO()
+    # Nested values are written as JSON so each job stays on one record
+    csv.writer(buffer).writerow([
+        json.dumps(row[field], default=str) if isinstance(row[field], (dict, list)) else row[field]
+        for field in EXPORT_FIELDS
+    ])
+    return buffer.getvalue()
+
+async def encode_rows(rows: AsyncIterator[Dict], format: str) -> AsyncIterator[bytes]:
+    """NDJSON or CSV bytes for the rows, in chunks of about EXPORT_CHUNK_SIZE"""
+    if format == "csv":
+        encode = csv_line
+        chunk = csv_line({field: field for field in EXPORT_FIELDS})
+    else:
+        encode = ndjson_line
+        chunk = ""
+
+    async for row in rows:
+        chunk += encode(row)
+        if len(chunk) >= EXPORT_CHUNK_SIZE:
+            yield chunk.encode("utf-8")
+            chunk = ""
+
+    if chunk:
+        yield chunk.encode("utf-8")
+
+async def gzip_chunks(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Gzip a byte stream on the fly"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31: gzip header and trailer
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
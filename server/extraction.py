@@ -0,0 +1,171 @@
+import os
+import asyncio
+import hashlib
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, Dict, List
+
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(10 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", str(min(4, os.cpu_count() or 1))))
+# PDF pages handed to each worker task
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "8"))
+
+SUPPORTED_EXTENSIONS = ('.txt', '.docx', '.pdf')
+
+class UploadTooLarge(Exception):
+    """The upload exceeded UPLOAD_MAX_BYTES while it was being read"""
+
+class ExtractionError(Exception):
+    """The file could not be parsed"""
+
+class SpooledUpload:
+    """An upload written to a temporary file, with the SHA-256 of its bytes"""
+
+    def __init__(self, path: str, filename: str, sha256: str, size: int):
+        self.path = path
+        self.filename = filename
+        self.sha256 = sha256
+        self.size = size
+
+    @property
+    def extension(self) -> str:
+        return os.path.splitext(self.filename.lower())[1]
+
+    def cleanup(self):
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+async def spool_upload(file, max_bytes: int = UPLOAD_MAX_BYTES) -> SpooledUpload:
+    """Copy an UploadFile to disk chunk by chunk, hashing as it goes"""
+    digest = hashlib.sha256()
+    size = 0
+    handle = tempfile.NamedTemporaryFile(prefix="upload-", delete=False)
+
+    try:
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLarge(f"Upload exceeds {max_bytes} bytes")
+            digest.update(chunk)
+            await asyncio.to_thread(handle.write, chunk)
+    except BaseException:
+        handle.close()
+        os.unlink(handle.name)
+        raise
+
+    handle.close()
+    return SpooledUpload(handle.name, file.filename or "", digest.hexdigest(), size)
+
+# Run in worker processes: each opens the file itself, so only paths and text cross the pool
+
+def pdf_page_count(path: str) -> int:
+    import PyPDF2
+    return len(PyPDF2.PdfReader(path).pages)
+
+def extract_pdf_pages(path: str, start: int, stop: int) -> List[str]:
+    import PyPDF2
+    pages = PyPDF2.PdfReader(path).pages
+    return [pages[i].extract_text() or "" for i in range(start, stop)]
+
+def extract_docx(path: str) -> str:
+    from docx import Document
+    return '\n'.join(p.text for p in Document(path).paragraphs)
+
+def read_text_file(path: str) -> str:
+    with open(path, 'rb') as f:
+        return f.read().decode('utf-8')
+
+class Extractor:
+    """Text extraction for uploads in a process pool, off the event loop"""
+
+    def __init__(self, workers: int = EXTRACTION_WORKERS):
+        self.workers = workers
+        self.pool = None
+        self.lock = threading.Lock()
+        self.extractions = 0
+        self.pages = 0
+        self.bytes = 0
+        self.errors = 0
+
+    async def _run(self, func, *args):
+        with self.lock:
+            if self.pool is None:
+                # Spawned, not forked: a fork of the threaded server can inherit held locks and deadlock
+                self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+            pool = self.pool
+        return await asyncio.get_running_loop().run_in_executor(pool, func, *args)
+
+    async def iter_text(self, upload: SpooledUpload) -> AsyncIterator[str]:
+        """Text of the upload in document order, yielded as each part is extracted"""
+        self.extractions += 1
+        self.bytes += upload.size
+
+        try:
+            if upload.extension == '.txt':
+                yield await asyncio.to_thread(read_text_file, upload.path)
+            elif upload.extension == '.docx':
+                yield await self._run(extract_docx, upload.path)
+            elif upload.extension == '.pdf':
+                page_count = await self._run(pdf_page_count, upload.path)
+                self.pages += page_count
+                # Page ranges are extracted in parallel and yielded in order
+                tasks = [
+                    asyncio.ensure_future(self._run(
+                        extract_pdf_pages, upload.path, start, min(start + PDF_PAGES_PER_TASK, page_count)
+                    ))
+                    for start in range(0, page_count, PDF_PAGES_PER_TASK)
+                ]
+                try:
+                    for task in tasks:
+                        yield '\n'.join(await task)
+                finally:
+                    for task in tasks:
+                        task.cancel()
+            else:
+                raise ExtractionError(f"Unsupported file type: {upload.extension or upload.filename}")
+        except ExtractionError:
+            self.errors += 1
+            raise
+        except Exception as e:
+            self.errors += 1
+            raise ExtractionError(f"Could not read {upload.filename}: {e}")
+
+    async def extract_text(self, upload: SpooledUpload) -> str:
+        return '\n'.join([part async for part in self.iter_text(upload)])
+
+    def shutdown(self):
+        with self.lock:
+            pool, self.pool = self.pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict:
+        return {
+            'workers': self.workers,
+            'extractions': self.extractions,
+            'pages': self.pages,
+            'bytes': self.bytes,
+            'errors': self.errors
+        }
+
+_extractor = None
+_extractor_lock = threading.Lock()
+
+def get_extractor() -> Extractor:
+    """Return the process-wide extractor; its worker pool starts on first use"""
+    global _extractor
+
+    if _extractor is None:
+        with _extractor_lock:
+            if _extractor is None:
+                _extractor = Extractor()
+
+    return _extractor
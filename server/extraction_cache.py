@@ -0,0 +1,177 @@
+import os
+import time
+import zlib
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from llm_cache import RedisCacheBackend
+
+EXTRACTION_CACHE_BACKEND = os.getenv("EXTRACTION_CACHE_BACKEND", "disk")  # disk, redis or none
+EXTRACTION_CACHE_DIR = os.getenv("EXTRACTION_CACHE_DIR", "./extraction_cache")
+EXTRACTION_CACHE_MAX_BYTES = int(os.getenv("EXTRACTION_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+EXTRACTION_CACHE_MAX_ENTRIES = int(os.getenv("EXTRACTION_CACHE_MAX_ENTRIES", "5000"))
+EXTRACTION_CACHE_TTL = int(os.getenv("EXTRACTION_CACHE_TTL", "604800"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+
+class DiskCacheBackend:
+    """Compressed files in a directory, bounded in bytes, least recently used evicted first.
+
+    A file's mtime is its expiry and its atime its last use, both set explicitly, so
+    every worker sharing the directory sees the same state and eviction covers files
+    written by any of them.
+    """
+
+    def __init__(self, directory: str = EXTRACTION_CACHE_DIR, max_bytes: int = EXTRACTION_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            expires = os.stat(path).st_mtime
+            if expires < time.time():
+                self._remove(path)
+                return None
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path, (time.time(), expires))
+        except FileNotFoundError:
+            # Missing, or evicted by another worker while being read
+            return None
+        return zlib.decompress(data).decode('utf-8')
+
+    def set(self, key: str, value: str, ttl: int):
+        data = zlib.compress(value.encode('utf-8'))
+        if len(data) > self.max_bytes:
+            return
+
+        # Written under a temporary name so readers never see a partial file
+        temp = self._path(f".{key}.{os.getpid()}.{threading.get_ident()}")
+        with open(temp, 'wb') as f:
+            f.write(data)
+        now = time.time()
+        os.utime(temp, (now, now + ttl))
+        os.replace(temp, self._path(key))
+
+        self._prune()
+
+    def _entries(self) -> List[Tuple[str, os.stat_result]]:
+        entries = []
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if entry.name.startswith('.'):
+                    continue
+                try:
+                    entries.append((entry.path, entry.stat()))
+                except FileNotFoundError:
+                    continue
+        return entries
+
+    def _prune(self):
+        """Drop expired files, then the least recently used until the directory fits max_bytes"""
+        # The directory, not a per-process counter, is the source of truth: other workers write to it too
+        now = time.time()
+        live = []
+        total = 0
+        for path, stat in self._entries():
+            if stat.st_mtime < now:
+                self._remove(path)
+                continue
+            live.append((stat.st_atime, stat.st_size, path))
+            total += stat.st_size
+
+        for _, size, path in sorted(live):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def _remove(self, path: str):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+    def size(self) -> int:
+        return len(self._entries())
+
+class RedisLRUBackend(RedisCacheBackend):
+    """Redis cache whose index is refreshed on reads, so eviction is least recently used"""
+
+    def get(self, key: str) -> Optional[str]:
+        value = super().get(key)
+        if value is not None:
+            self.client.zadd(self.index_key, {key: time.time()})
+        return value
+
+class ExtractionCache:
+    """Extracted upload text by the SHA-256 of the uploaded bytes"""
+
+    def __init__(self, backend, ttl: int = EXTRACTION_CACHE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def get(self, sha256: str) -> Optional[str]:
+        try:
+            value = self.backend.get(sha256)
+        except Exception as e:
+            print(f"Extraction cache read error: {e}")
+            self.errors += 1
+            value = None
+
+        if value is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return value
+
+    def set(self, sha256: str, text: str):
+        try:
+            self.backend.set(sha256, text, self.ttl)
+        except Exception as e:
+            print(f"Extraction cache write error: {e}")
+            self.errors += 1
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        try:
+            size = self.backend.size()
+        except Exception:
+            size = None
+        return {
+            'backend': EXTRACTION_CACHE_BACKEND,
+            'hits': self.hits,
+            'misses': self.misses,
+            'errors': self.errors,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'size': size
+        }
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_extraction_cache() -> Optional[ExtractionCache]:
+    """Return the process-wide extraction cache, or None when caching is disabled"""
+    global _cache
+
+    if EXTRACTION_CACHE_BACKEND == "none":
+        return None
+
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                if EXTRACTION_CACHE_BACKEND == "redis":
+                    backend = RedisLRUBackend(max_entries=EXTRACTION_CACHE_MAX_ENTRIES, prefix="extraction_cache")
+                else:
+                    backend = DiskCacheBackend()
+                _cache = ExtractionCache(backend)
+
+    return _cache
@@ -0,0 +1,199 @@
+"""OpenAI-compatible stand-in for load-testing the LLM engines offline.
+
+Run it, then point the engines at it:
+
+    python fake_openai_server.py --port 8001
+    OPENAI_BASE_URL=http://localhost:8001/v1 OPENAI_API_KEY=fake python benchmark_llm.py
+"""
+import os
+import re
+import json
+import math
+import time
+import uuid
+import random
+import asyncio
+import argparse
+from typing import Dict, List
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+import uvicorn
+
+from token_budget import count_tokens
+
+# Latency before the first token: fixed:MS, uniform:MIN_MS,MAX_MS or lognormal:MEDIAN_MS,SIGMA
+FAKE_LLM_LATENCY = os.getenv("FAKE_LLM_LATENCY", "lognormal:400,0.5")
+FAKE_LLM_TOKENS_PER_SEC = float(os.getenv("FAKE_LLM_TOKENS_PER_SEC", "80"))
+FAKE_LLM_ERROR_RATE = float(os.getenv("FAKE_LLM_ERROR_RATE", "0"))
+FAKE_LLM_RATE_LIMIT_RATE = float(os.getenv("FAKE_LLM_RATE_LIMIT_RATE", "0"))
+FAKE_LLM_TRANSFORM = os.getenv("FAKE_LLM_TRANSFORM", "contractions")  # echo, contractions or upper
+FAKE_LLM_SEED = int(os.getenv("FAKE_LLM_SEED", "42"))
+
+# Lines the engine prompts put in front of the text to rewrite, one per prompt template
+TEXT_MARKERS = [
+    "Text to rewrite:\n",                                                         # exact
+    "Original text:\n",                                                           # openai
+    "Restructure this text to sound completely natural and human:\n\n",           # pro, pass 1
+    "Make this text sound genuinely human with natural imperfections:\n\n",       # pro, pass 2
+    "completely restructure with YOUR voice:\n\n",                                # ultimate, pass 1
+    "Make this sound MORE human and natural:\n\n",                                # ultimate, pass 2
+    "Add personality and natural imperfections:\n\n",                             # advanced, pass 1
+    "Add personality and unpredictability:\n\n",                                  # advanced, pass 2
+]
+
+# Blocks that follow the text: the templates' requirement lists, the long-document
+# continuity note and, in fused prompts, the second pass
+TEXT_TRAILERS = [
+    "\n\nInstructions:\n",
+    "\n\nRequirements:\n",
+    "\n\nFocus on:\n",
+    "\n\nTarget style:\n",
+    "\n\nStyle requirements:\n",
+    "\n\nThis passage continues directly from:",
+    "\n\nPASS 2\n",
+]
+
+CONTRACTIONS = {
+    r'\bdo not\b': "don't", r'\bdoes not\b': "doesn't", r'\bis not\b': "isn't",
+    r'\bare not\b': "aren't", r'\bcannot\b': "can't", r'\bwill not\b': "won't",
+    r'\bit is\b': "it's", r'\bthat is\b': "that's", r'\bthey are\b': "they're",
+    r'\bwe are\b': "we're", r'\byou are\b': "you're", r'\bI am\b': "I'm",
+}
+
+app = FastAPI(title="Fake OpenAI API")
+rng = random.Random(FAKE_LLM_SEED)
+stats = {'requests': 0, 'errors': 0, 'rate_limited': 0}
+
+def sample_latency(spec: str = FAKE_LLM_LATENCY) -> float:
+    """First-token latency in seconds drawn from the configured distribution"""
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v]
+
+    if kind == "fixed":
+        ms = values[0]
+    elif kind == "uniform":
+        ms = rng.uniform(values[0], values[1])
+    elif kind == "lognormal":
+        ms = values[0] * math.exp(rng.gauss(0, values[1]))
+    else:
+        raise ValueError(f"Unknown latency distribution: {spec}")
+
+    return ms / 1000
+
+def extract_text(messages: List[Dict]) -> str:
+    """Pull the text being rewritten out of the last user message"""
+    prompt = next((m['content'] for m in reversed(messages) if m.get('role') == 'user'), "")
+
+    # The first marker in the prompt starts the text; in a fused prompt that is pass 1's
+    found = [(prompt.find(marker), marker) for marker in TEXT_MARKERS if marker in prompt]
+    if found:
+        position, marker = min(found)
+        text = prompt[position + len(marker):]
+        ends = [text.find(trailer) for trailer in TEXT_TRAILERS if trailer in text]
+        return text[:min(ends)].strip() if ends else text.strip()
+
+    # Otherwise the text is the largest block of the prompt
+    blocks = [b.strip() for b in prompt.split("\n\n") if b.strip()]
+    return max(blocks, key=len) if blocks else ""
+
+def transform(text: str, mode: str = FAKE_LLM_TRANSFORM) -> str:
+    """Deterministic stand-in for a rewrite; placeholders pass through untouched"""
+    if mode == "echo":
+        return text
+    if mode == "upper":
+        return re.sub(r'\b(?!__)\w+', lambda m: m.group().upper(), text)
+    if mode == "contractions":
+        for pattern, contraction in CONTRACTIONS.items():
+            text = re.sub(pattern, contraction, text)
+        return text
+    raise ValueError(f"Unknown transform: {mode}")
+
+def error_response(status_code: int, message: str, error_type: str, headers: Dict = None) -> JSONResponse:
+    return JSONResponse(
+        status_code=status_code,
+        content={"error": {"message": message, "type": error_type, "code": None, "param": None}},
+        headers=headers
+    )
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    stats['requests'] += 1
+
+    roll = rng.random()
+    if roll < FAKE_LLM_RATE_LIMIT_RATE:
+        stats['rate_limited'] += 1
+        return error_response(429, "Rate limit reached (injected)", "rate_limit_error", {"retry-after": "1"})
+    if roll < FAKE_LLM_RATE_LIMIT_RATE + FAKE_LLM_ERROR_RATE:
+        stats['errors'] += 1
+        return error_response(500, "Internal server error (injected)", "server_error")
+
+    model = body.get('model', 'gpt-4o-mini')
+    content = transform(extract_text(body.get('messages', [])))
+    if body.get('max_tokens'):
+        # Mimic truncation at the output limit (roughly four characters per token)
+        content = content[:body['max_tokens'] * 4]
+
+    prompt_tokens = sum(count_tokens(m.get('content', ''), model) for m in body.get('messages', []))
+    completion_tokens = count_tokens(content, model)
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    created = int(time.time())
+
+    await asyncio.sleep(sample_latency())
+
+    if body.get('stream'):
+        return StreamingResponse(
+            stream_chunks(completion_id, created, model, content),
+            media_type="text/event-stream"
+        )
+
+    await asyncio.sleep(completion_tokens / FAKE_LLM_TOKENS_PER_SEC)
+
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": created,
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop"
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+    }
+
+async def stream_chunks(completion_id: str, created: int, model: str, content: str):
+    def chunk(delta: Dict, finish_reason=None) -> str:
+        payload = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+        }
+        return f"data: {json.dumps(payload)}\n\n"
+
+    yield chunk({"role": "assistant", "content": ""})
+
+    for piece in re.findall(r'\S+\s*', content):
+        await asyncio.sleep(count_tokens(piece, model) / FAKE_LLM_TOKENS_PER_SEC)
+        yield chunk({"content": piece})
+
+    yield chunk({}, "stop")
+    yield "data: [DONE]\n\n"
+
+@app.get("/v1/stats")
+async def get_stats():
+    return stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake OpenAI chat completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    args = parser.parse_args()
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,31 @@
+import os
+from typing import Dict, List
+
+# Two-stage engines make one completion instead of two when enabled
+LLM_FUSED_PASSES = os.getenv("LLM_FUSED_PASSES", "false").lower() in ("1", "true", "yes")
+
+# Stands in for the pass 1 output inside the pass 2 instructions
+PASS_ONE_RESULT = "[your pass 1 rewrite]"
+
+def fuse_passes(first_system: str, first_user: str, second_system: str, second_user: str) -> List[Dict]:
+    """Messages asking for both editing passes in a single completion"""
+    system = f"""You edit text in two passes and deliver only the final result, in a single response.
+
+PASS 1
+{first_system}
+
+PASS 2 (applied to your pass 1 rewrite)
+{second_system}
+
+Do not output the pass 1 draft, labels or explanations. Return only the text after both passes."""
+
+    user = f"""PASS 1
+{first_user}
+
+PASS 2
+{second_user}"""
+
+    return [
+        {"role": "system", "content": system},
+        {"role": "user", "content": user}
+    ]
@@ -7,9 +7,13 @@ import textstat
 import nltk
 import numpy as np
 from typing import Dict, List, Optional, Tuple
-from openai import OpenAI
 import spacy
 
+from llm_client import chat_completion, create_openai_client
+from llm_resilience import local_humanize
+from fused_passes import LLM_FUSED_PASSES, PASS_ONE_RESULT, fuse_passes
+from token_budget import budget_max_tokens
+
 try:
     nltk.download('punkt_tab', quiet=True)
     nltk.download('punkt', quiet=True)
@@ -19,8 +23,9 @@ except:
     pass
 
 class AdvancedHumanizationEngine:
-    def __init__(self):
-        self.client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+    def __init__(self, fused_passes: Optional[bool] = None):
+        self.client = create_openai_client()
+        self.fused_passes = LLM_FUSED_PASSES if fused_passes is None else fused_passes
         try:
             self.nlp = spacy.load("en_core_web_sm")
         except:
@@ -81,7 +86,7 @@ class AdvancedHumanizationEngine:
         # Apply multi-pass humanization for better results
         humanized_text = self._multi_pass_humanization(
             processed_text, tone, formality, burstiness,
-            idiom_density, conciseness, temperature, perplexity_target
+            idiom_density, conciseness, temperature, perplexity_target, seed
         )
 
         # Restore preserved elements
@@ -108,10 +113,87 @@ class AdvancedHumanizationEngine:
         }
 
     def _multi_pass_humanization(self, text, tone, formality, burstiness,
-                                  idiom_density, conciseness, temperature, perplexity_target):
+                                  idiom_density, conciseness, temperature, perplexity_target,
+                                  seed=None):
         """Multiple passes with different strategies to avoid AI detection"""
 
-        # First pass: Break AI patterns and add human quirks
+        try:
+            if self.fused_passes:
+                return self._fused_humanization(
+                    text, tone, burstiness, idiom_density, conciseness,
+                    temperature, perplexity_target, seed
+                )
+
+            # First pass: Break AI patterns and add human quirks
+            system_prompt_1, user_prompt_1 = self._first_pass_prompts(text, tone)
+
+            messages_1 = [
+                {"role": "system", "content": system_prompt_1},
+                {"role": "user", "content": user_prompt_1}
+            ]
+            response_1 = chat_completion(
+                self.client,
+                model="gpt-4o-mini",
+                messages=messages_1,
+                temperature=temperature,
+                max_tokens=budget_max_tokens(messages_1, text),
+                presence_penalty=0.6,  # Encourage variety
+                frequency_penalty=0.4,  # Reduce repetition
+                seed=seed
+            )
+
+            intermediate_text = response_1.choices[0].message.content.strip()
+
+            # Second pass: Add more human unpredictability
+            system_prompt_2, user_prompt_2 = self._second_pass_prompts(
+                intermediate_text, burstiness, idiom_density, conciseness, perplexity_target
+            )
+
+            messages_2 = [
+                {"role": "system", "content": system_prompt_2},
+                {"role": "user", "content": user_prompt_2}
+            ]
+            response_2 = chat_completion(
+                self.client,
+                model="gpt-4o-mini",
+                messages=messages_2,
+                temperature=min(1.0, temperature + 0.2),  # Slightly higher for more variety
+                max_tokens=budget_max_tokens(messages_2, intermediate_text),
+                presence_penalty=0.7,
+                frequency_penalty=0.5,
+                seed=seed
+            )
+
+            final_text = response_2.choices[0].message.content.strip()
+
+            return final_text
+
+        except Exception as e:
+            print(f"Error in multi-pass humanization: {str(e)}")
+            return local_humanize(text, formality) or self._fallback_humanize(text)
+
+    def _fused_humanization(self, text, tone, burstiness, idiom_density, conciseness,
+                            temperature, perplexity_target, seed=None):
+        """Both passes in one completion, so the text is sent and generated only once"""
+        messages = fuse_passes(
+            *self._first_pass_prompts(text, tone),
+            *self._second_pass_prompts(PASS_ONE_RESULT, burstiness, idiom_density, conciseness, perplexity_target)
+        )
+
+        response = chat_completion(
+            self.client,
+            model="gpt-4o-mini",
+            messages=messages,
+            temperature=min(1.0, temperature + 0.2),
+            max_tokens=budget_max_tokens(messages, text),
+            presence_penalty=0.7,
+            frequency_penalty=0.5,
+            seed=seed
+        )
+
+        return response.choices[0].message.content.strip()
+
+    def _first_pass_prompts(self, text, tone):
         system_prompt_1 = """You are a human writer with unique personal style and occasional imperfections.
 Your task is to rewrite text to sound genuinely human by:
 
@@ -157,23 +239,10 @@ Target style:
 - Include personal voice and subjective elements
 - Make it conversational where appropriate"""
 
-        try:
-            response_1 = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": system_prompt_1},
-                    {"role": "user", "content": user_prompt_1}
-                ],
-                temperature=temperature,
-                max_tokens=2000,
-                presence_penalty=0.6,  # Encourage variety
-                frequency_penalty=0.4   # Reduce repetition
-            )
+        return system_prompt_1, user_prompt_1
 
-            intermediate_text = response_1.choices[0].message.content.strip()
-
-            # Second pass: Add more human unpredictability
-            system_prompt_2 = f"""You are editing a text to make it even more human-like.
+    def _second_pass_prompts(self, text, burstiness, idiom_density, conciseness, perplexity_target):
+        system_prompt_2 = f"""You are editing a text to make it even more human-like.
 Focus on these specific techniques:
 
 1. Add unexpected elements:
@@ -198,35 +267,17 @@ Focus on these specific techniques:
 - Using {'common everyday words' if perplexity_target < 40 else 'mix of common and sophisticated vocabulary' if perplexity_target < 60 else 'varied and sometimes unexpected word choices'}
 - {'Keeping it simple and direct' if perplexity_target < 40 else 'Balancing complexity' if perplexity_target < 60 else 'Adding complexity and nuance'}"""
 
-            user_prompt_2 = f"""Make this text even more human-like with high burstiness (varied sentence lengths)
+        user_prompt_2 = f"""Make this text even more human-like with high burstiness (varied sentence lengths)
 and natural flow. Add personality and unpredictability:
 
-{intermediate_text}
+{text}
 
 Requirements:
 - Burstiness level: {'extreme variation' if burstiness > 0.7 else 'moderate variation' if burstiness > 0.4 else 'gentle variation'}
 - Include {f'{int(idiom_density * 10)} idioms or colloquial expressions per 100 words' if idiom_density > 0 else 'minimal idioms'}
 - {'Be concise and punchy' if conciseness > 0.7 else 'Be balanced' if conciseness > 0.3 else 'Be detailed and elaborate'}"""
 
-            response_2 = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": system_prompt_2},
-                    {"role": "user", "content": user_prompt_2}
-                ],
-                temperature=min(1.0, temperature + 0.2),  # Slightly higher for more variety
-                max_tokens=2000,
-                presence_penalty=0.7,
-                frequency_penalty=0.5
-            )
-
-            final_text = response_2.choices[0].message.content.strip()
-
-            return final_text
-
-        except Exception as e:
-            print(f"Error in multi-pass humanization: {str(e)}")
-            return self._fallback_humanize(text)
+        return system_prompt_2, user_prompt_2
 
     def _apply_advanced_techniques(self, text: str, burstiness: float, perplexity_target: int) -> str:
         """Apply additional techniques to make text more human-like"""
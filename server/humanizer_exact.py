@@ -11,7 +11,9 @@ import hashlib
 import json
 import textstat
 from typing import List, Dict, Tuple, Optional
-from openai import OpenAI
+
+from llm_client import chat_completion, create_openai_client
+from token_budget import budget_max_tokens, chunk_token_limit, count_message_tokens, join_chunks, split_text_with_separators
 
 # Core NLP imports with fallback handling
 try:
@@ -873,26 +875,44 @@ class ExactHumanizationEngine:
         # Initialize OpenAI client
         api_key = os.getenv("OPENAI_API_KEY")
         if api_key:
-            self.client = OpenAI(api_key=api_key)
+            self.client = create_openai_client()
         else:
             self.client = None
+        # Set when a provider call failed and its chunk kept the unmodified text
+        self.llm_fallback = False
 
     def apply_chatgpt_parameters(self, text: str, tone: str, formality: float,
                                 burstiness: float, perplexity_target: int,
                                 idiom_density: float, conciseness: float,
-                                temperature: float, style_profile: Optional[str] = None) -> str:
+                                temperature: float, style_profile: Optional[str] = None,
+                                seed: Optional[int] = None) -> str:
         """First stage: Use ChatGPT to adjust text parameters"""
         if not self.client:
             return text
 
-        try:
-            # Build the prompt for parameter adjustment
-            formality_desc = "very casual" if formality < 0.3 else "moderate" if formality < 0.7 else "formal"
-            burstiness_desc = "low variation" if burstiness < 0.3 else "moderate variation" if burstiness < 0.7 else "high variation"
-            idiom_desc = "minimal" if idiom_density < 0.3 else "moderate" if idiom_density < 0.7 else "frequent"
-            conciseness_desc = "elaborate" if conciseness < 0.3 else "balanced" if conciseness < 0.7 else "concise"
+        instructions = self._chatgpt_instructions(
+            tone, formality, burstiness, perplexity_target, idiom_density, conciseness, style_profile
+        )
 
-            prompt = f"""Rewrite the following text with these specific characteristics:
+        # Documents too long for one call are rewritten paragraph-aligned chunk by chunk
+        prompt_tokens = count_message_tokens(self._chatgpt_messages(instructions, ""))
+        chunks, separators = split_text_with_separators(text, chunk_token_limit(prompt_tokens))
+
+        return join_chunks([
+            self._chatgpt_rewrite(chunk, instructions, temperature, seed) for chunk in chunks
+        ], separators)
+
+    def _chatgpt_instructions(self, tone: str, formality: float, burstiness: float,
+                              perplexity_target: int, idiom_density: float, conciseness: float,
+                              style_profile: Optional[str] = None) -> str:
+        """Prompt for the parameter adjustment; the text to rewrite is appended to it"""
+        # Build the prompt for parameter adjustment
+        formality_desc = "very casual" if formality < 0.3 else "moderate" if formality < 0.7 else "formal"
+        burstiness_desc = "low variation" if burstiness < 0.3 else "moderate variation" if burstiness < 0.7 else "high variation"
+        idiom_desc = "minimal" if idiom_density < 0.3 else "moderate" if idiom_density < 0.7 else "frequent"
+        conciseness_desc = "elaborate" if conciseness < 0.3 else "balanced" if conciseness < 0.7 else "concise"
+
+        return f"""Rewrite the following text with these specific characteristics:
 - Tone: {tone}
 - Formality: {formality_desc} (level {formality:.1f})
 - Sentence variation (burstiness): {burstiness_desc} - mix short and long sentences
@@ -904,22 +924,32 @@ class ExactHumanizationEngine:
 Important: Maintain the core meaning while adjusting these parameters naturally. Make the text feel human-written.
 
 Text to rewrite:
-{text}"""
+"""
 
-            response = self.client.chat.completions.create(
+    def _chatgpt_messages(self, instructions: str, text: str) -> List[Dict]:
+        return [
+            {"role": "system", "content": "You are an expert writer who adjusts text style while preserving meaning."},
+            {"role": "user", "content": instructions + text}
+        ]
+
+    def _chatgpt_rewrite(self, text: str, instructions: str, temperature: float,
+                         seed: Optional[int] = None) -> str:
+        try:
+            messages = self._chatgpt_messages(instructions, text)
+            response = chat_completion(
+                self.client,
                 model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": "You are an expert writer who adjusts text style while preserving meaning."},
-                    {"role": "user", "content": prompt}
-                ],
+                messages=messages,
                 temperature=temperature,
-                max_tokens=max(len(text.split()) * 2, 500)
+                max_tokens=budget_max_tokens(messages, text),
+                seed=seed
             )
 
             return response.choices[0].message.content.strip()
 
         except Exception as e:
             print(f"ChatGPT parameter adjustment failed: {e}")
+            self.llm_fallback = True
             return text
 
     def humanize(
@@ -943,10 +973,11 @@ Text to rewrite:
 
         # Stage 1: Apply ChatGPT parameter adjustments
         print("🎯 Stage 1: Applying ChatGPT parameter adjustments...")
+        self.llm_fallback = False
         adjusted_text = self.apply_chatgpt_parameters(
             text, tone, formality, burstiness,
             perplexity_target, idiom_density, conciseness,
-            temperature, style_profile_id
+            temperature, style_profile_id, seed
         )
 
         # Stage 2: Apply the exact humanization algorithm
@@ -973,5 +1004,6 @@ Text to rewrite:
                 {'type': 'parameter_adjustment', 'description': 'ChatGPT parameter tuning'},
                 {'type': 'complete_transformation', 'description': '5-pass advanced humanization'}
             ],
-            'preserved_elements': {'citations': [], 'quotes': []}
+            'preserved_elements': {'citations': [], 'quotes': []},
+            'llm_fallback': self.llm_fallback
         }
\ No newline at end of file
@@ -6,10 +6,14 @@ import json
 import textstat
 import nltk
 import numpy as np
-from typing import Dict, List, Optional
-from openai import OpenAI
+from typing import Dict, Iterator, List, Optional
 import spacy
 
+from llm_client import chat_completion, create_openai_client, stream_chat_completion
+from llm_resilience import local_humanize
+from token_budget import budget_max_tokens
+from long_document import context_note, is_long_document, rewrite_chunks, split_document, stitch_document
+
 try:
     nltk.download('punkt_tab', quiet=True)
     nltk.download('punkt', quiet=True)
@@ -20,7 +24,7 @@ except:
 
 class HumanizationEngine:
     def __init__(self):
-        self.client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+        self.client = create_openai_client()
         try:
             self.nlp = spacy.load("en_core_web_sm")
         except:
@@ -46,6 +50,84 @@ class HumanizationEngine:
         integrity_mode: str = 'editor'
     ) -> Dict:
 
+        preserved_elements, processed_text, request = self._prepare_request(
+            text, tone, formality, burstiness, idiom_density, conciseness,
+            temperature, seed, preserve_citations, preserve_quotes, max_tokens, integrity_mode
+        )
+
+        try:
+            if is_long_document(processed_text):
+                # Long documents: rewrite paragraph-aligned chunks concurrently
+                chunks, separators = split_document(processed_text)
+                humanized_text = stitch_document(rewrite_chunks(
+                    chunks,
+                    lambda chunk, context: self._rewrite(self._build_request(
+                        chunk, tone, formality, burstiness, idiom_density, conciseness,
+                        temperature, seed, None, integrity_mode, context
+                    ))
+                ), separators)
+            else:
+                # Call OpenAI API
+                humanized_text = self._rewrite(request)
+
+            return self._finalize_result(text, humanized_text, preserved_elements, integrity_mode)
+
+        except Exception as e:
+            print(f"Error in humanization: {str(e)}")
+            # Fall back to a local engine if the API fails
+            return {
+                'humanized_text': self._local_fallback(processed_text, formality, preserved_elements),
+                'metrics': {},
+                'changes': [],
+                'preserved_elements': preserved_elements
+            }
+
+    def humanize_stream(
+        self,
+        text: str,
+        tone: str = 'neutral',
+        formality: float = 0.5,
+        burstiness: float = 0.5,
+        perplexity_target: int = 50,
+        idiom_density: float = 0.3,
+        conciseness: float = 0.5,
+        temperature: float = 0.7,
+        seed: Optional[int] = None,
+        preserve_citations: bool = True,
+        preserve_quotes: bool = True,
+        keep_language: bool = True,
+        max_tokens: Optional[int] = None,
+        style_profile_id: Optional[str] = None,
+        integrity_mode: str = 'editor'
+    ) -> Iterator[Dict]:
+        """Yield delta events while the rewrite is generated, then one final result event"""
+        preserved_elements, processed_text, request = self._prepare_request(
+            text, tone, formality, burstiness, idiom_density, conciseness,
+            temperature, seed, preserve_citations, preserve_quotes, max_tokens, integrity_mode
+        )
+
+        parts = []
+        try:
+            for delta in stream_chat_completion(self.client, **request):
+                parts.append(delta)
+                yield {'type': 'delta', 'content': delta}
+
+            # Restoration and watermarking need the complete text
+            result = self._finalize_result(text, ''.join(parts).strip(), preserved_elements, integrity_mode)
+
+        except Exception as e:
+            print(f"Error in streaming humanization: {str(e)}")
+            result = {
+                'humanized_text': self._local_fallback(processed_text, formality, preserved_elements),
+                'metrics': {},
+                'changes': [],
+                'preserved_elements': preserved_elements
+            }
+
+        yield {'type': 'result', 'result': result}
+
+    def _prepare_request(self, text, tone, formality, burstiness, idiom_density, conciseness,
+                         temperature, seed, preserve_citations, preserve_quotes, max_tokens, integrity_mode):
         if seed:
             random.seed(seed)
             np.random.seed(seed)
@@ -54,6 +136,15 @@ class HumanizationEngine:
         preserved_elements = self._extract_preserved_elements(text, preserve_citations, preserve_quotes)
         processed_text = self._preprocess(text, preserved_elements)
 
+        request = self._build_request(
+            processed_text, tone, formality, burstiness, idiom_density, conciseness,
+            temperature, seed, max_tokens, integrity_mode
+        )
+
+        return preserved_elements, processed_text, request
+
+    def _build_request(self, processed_text, tone, formality, burstiness, idiom_density, conciseness,
+                       temperature, seed, max_tokens, integrity_mode, context: str = "") -> Dict:
         # Build the prompt for OpenAI
         system_prompt = self._build_system_prompt(
             tone, formality, burstiness, idiom_density, conciseness, integrity_mode
@@ -72,51 +163,45 @@ Instructions:
 - Conciseness: {'very concise' if conciseness > 0.7 else 'balanced' if conciseness > 0.3 else 'elaborate'}
 {'- Academic integrity mode: Maintain scholarly tone and precision' if integrity_mode == 'academic' else ''}
 
-Please provide only the rewritten text without any explanations or metadata."""
+Please provide only the rewritten text without any explanations or metadata.{context_note(context)}"""
 
-        try:
-            # Call OpenAI API
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=temperature,
-                max_tokens=max_tokens or 2000
-            )
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
 
-            humanized_text = response.choices[0].message.content.strip()
+        return {
+            'model': "gpt-4o-mini",
+            'messages': messages,
+            'temperature': temperature,
+            'max_tokens': budget_max_tokens(messages, processed_text, requested=max_tokens),
+            'seed': seed
+        }
 
-            # Restore preserved elements
-            humanized_text = self._restore_preserved_elements(humanized_text, preserved_elements)
+    def _rewrite(self, request: Dict) -> str:
+        response = chat_completion(self.client, **request)
+        return response.choices[0].message.content.strip()
 
-            # Apply academic integrity watermarking if needed
-            if integrity_mode == 'academic':
-                humanized_text = self._apply_academic_integrity(humanized_text, preserved_elements)
+    def _finalize_result(self, text: str, humanized_text: str, preserved_elements: Dict, integrity_mode: str) -> Dict:
+        # Restore preserved elements
+        humanized_text = self._restore_preserved_elements(humanized_text, preserved_elements)
 
-            # Calculate metrics
-            metrics = self._calculate_metrics(text, humanized_text)
+        # Apply academic integrity watermarking if needed
+        if integrity_mode == 'academic':
+            humanized_text = self._apply_academic_integrity(humanized_text, preserved_elements)
 
-            # Identify changes
-            changes = self._identify_changes_list(text, humanized_text)
+        # Calculate metrics
+        metrics = self._calculate_metrics(text, humanized_text)
 
-            return {
-                'humanized_text': humanized_text,
-                'metrics': metrics,
-                'changes': changes,
-                'preserved_elements': preserved_elements
-            }
+        # Identify changes
+        changes = self._identify_changes_list(text, humanized_text)
 
-        except Exception as e:
-            print(f"Error in humanization: {str(e)}")
-            # Fallback to simple transformation if API fails
-            return {
-                'humanized_text': self._fallback_humanize(processed_text),
-                'metrics': {},
-                'changes': [],
-                'preserved_elements': preserved_elements
-            }
+        return {
+            'humanized_text': humanized_text,
+            'metrics': metrics,
+            'changes': changes,
+            'preserved_elements': preserved_elements
+        }
 
     def _build_system_prompt(self, tone, formality, burstiness, idiom_density, conciseness, integrity_mode):
         base_prompt = "You are an expert writer who transforms text to sound more natural and human-like while preserving the original meaning."
@@ -154,6 +239,10 @@ Please provide only the rewritten text without any explanations or metadata."""
 
         return " ".join(prompt_parts)
 
+    def _local_fallback(self, processed_text: str, formality: float, preserved_elements: Dict) -> str:
+        humanized_text = local_humanize(processed_text, formality) or self._fallback_humanize(processed_text)
+        return self._restore_preserved_elements(humanized_text, preserved_elements)
+
     def _fallback_humanize(self, text):
         """Simple fallback humanization without API"""
         # Basic transformations
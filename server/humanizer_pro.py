@@ -8,10 +8,15 @@ import nltk
 import numpy as np
 import math
 from typing import Dict, List, Optional, Tuple
-from openai import OpenAI
 from collections import defaultdict, Counter
 import string
 
+from llm_client import chat_completion, create_openai_client
+from fused_passes import LLM_FUSED_PASSES, PASS_ONE_RESULT, fuse_passes
+from llm_resilience import local_humanize
+from token_budget import budget_max_tokens
+from long_document import context_note, is_long_document, rewrite_chunks, split_document, stitch_document
+
 try:
     nltk.download('punkt_tab', quiet=True)
     nltk.download('punkt', quiet=True)
@@ -25,8 +30,9 @@ from nltk.tokenize import sent_tokenize, word_tokenize
 from nltk.corpus import wordnet, stopwords
 
 class ProHumanizationEngine:
-    def __init__(self):
-        self.client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+    def __init__(self, fused_passes: Optional[bool] = None):
+        self.client = create_openai_client()
+        self.fused_passes = LLM_FUSED_PASSES if fused_passes is None else fused_passes
         self.setup_humanization_patterns()
         self.load_linguistic_resources()
 
@@ -226,7 +232,7 @@ class ProHumanizationEngine:
         # Multi-pass humanization
         humanized_text = self._multiple_pass_humanization(
             processed_text, tone, formality, burstiness,
-            idiom_density, conciseness, temperature, perplexity_target
+            idiom_density, conciseness, temperature, perplexity_target, seed
         )
 
         # Restore preserved elements
@@ -250,28 +256,74 @@ class ProHumanizationEngine:
         }
 
     def _multiple_pass_humanization(self, text, tone, formality, burstiness,
-                                   idiom_density, conciseness, temperature, perplexity_target):
+                                   idiom_density, conciseness, temperature, perplexity_target,
+                                   seed=None):
         """Apply multiple humanization passes (5-pass system from proven code)"""
+        if is_long_document(text):
+            return self._long_document_humanization(
+                text, tone, formality, burstiness, temperature, perplexity_target, seed
+            )
+
         current_text = text
 
         # Pass 1: AI pattern replacement
         current_text = self._replace_ai_patterns(current_text, probability=0.85)
 
+        if self.fused_passes:
+            # Passes 2 and 4 in a single OpenAI call, local touches applied afterwards
+            current_text = self._openai_fused_rewrite(
+                current_text, tone, formality, burstiness, perplexity_target, temperature, seed
+            )
+            current_text = self._apply_contractions(current_text, probability=0.6)
+            current_text = self._add_human_touches(current_text, formality)
+            return self._final_polish(current_text)
+
         # Pass 2: Restructure sentences with OpenAI
-        current_text = self._openai_restructure(current_text, tone, formality, temperature)
+        current_text = self._openai_restructure(current_text, tone, formality, temperature, seed)
 
         # Pass 3: Apply contractions and human touches
         current_text = self._apply_contractions(current_text, probability=0.6)
         current_text = self._add_human_touches(current_text, formality)
 
         # Pass 4: Advanced paraphrasing with OpenAI
-        current_text = self._openai_advanced_paraphrase(current_text, burstiness, perplexity_target, temperature)
+        current_text = self._openai_advanced_paraphrase(current_text, burstiness, perplexity_target, temperature, seed)
 
         # Pass 5: Final polish and quality check
         current_text = self._final_polish(current_text)
 
         return current_text
 
+    def _long_document_humanization(self, text, tone, formality, burstiness,
+                                    temperature, perplexity_target, seed=None):
+        """Same 5 passes over paragraph-aligned chunks, with the OpenAI passes run concurrently"""
+        # Local passes walk the chunks in order so seeded runs stay reproducible
+        chunks, separators = split_document(text)
+        chunks = [self._replace_ai_patterns(chunk, probability=0.85) for chunk in chunks]
+
+        if self.fused_passes:
+            chunks = rewrite_chunks(chunks, lambda chunk, context: self._openai_fused_rewrite(
+                chunk, tone, formality, burstiness, perplexity_target, temperature, seed, context
+            ))
+            return stitch_document([
+                self._final_polish(self._add_human_touches(self._apply_contractions(chunk, probability=0.6), formality))
+                for chunk in chunks
+            ], separators)
+
+        chunks = rewrite_chunks(chunks, lambda chunk, context: self._openai_restructure(
+            chunk, tone, formality, temperature, seed, context
+        ))
+
+        chunks = [
+            self._add_human_touches(self._apply_contractions(chunk, probability=0.6), formality)
+            for chunk in chunks
+        ]
+
+        chunks = rewrite_chunks(chunks, lambda chunk, context: self._openai_advanced_paraphrase(
+            chunk, burstiness, perplexity_target, temperature, seed, context
+        ))
+
+        return stitch_document([self._final_polish(chunk) for chunk in chunks], separators)
+
     def _replace_ai_patterns(self, text: str, probability: float = 0.85) -> str:
         """Replace AI-flagged patterns aggressively"""
         result = text
@@ -288,9 +340,35 @@ class ProHumanizationEngine:
 
         return result
 
-    def _openai_restructure(self, text: str, tone: str, formality: float, temperature: float) -> str:
+    def _openai_restructure(self, text: str, tone: str, formality: float, temperature: float,
+                            seed: Optional[int] = None, context: str = "") -> str:
         """Use OpenAI to restructure sentences naturally"""
 
+        system_prompt, user_prompt = self._restructure_prompts(text, tone, formality, context)
+
+        try:
+            messages = [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ]
+            response = chat_completion(
+                self.client,
+                model="gpt-4o-mini",
+                messages=messages,
+                temperature=temperature,
+                max_tokens=budget_max_tokens(messages, text),
+                presence_penalty=0.8,
+                frequency_penalty=0.6,
+                seed=seed
+            )
+
+            return response.choices[0].message.content.strip()
+
+        except Exception as e:
+            print(f"OpenAI restructure error: {e}")
+            return local_humanize(text, formality) or text
+
+    def _restructure_prompts(self, text: str, tone: str, formality: float, context: str = ""):
         system_prompt = """You are rewriting text to sound more natural and human.
 
 CRITICAL RULES:
@@ -314,26 +392,9 @@ Requirements:
 - Formality: {'very casual' if formality < 0.3 else 'conversational' if formality < 0.6 else 'professional'}
 - Make sentence lengths VERY different (mix 3-word sentences with 25+ word ones)
 - Start sentences unconventionally sometimes
-- Add natural flow and personality"""
-
-        try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=temperature,
-                max_tokens=3000,
-                presence_penalty=0.8,
-                frequency_penalty=0.6
-            )
-
-            return response.choices[0].message.content.strip()
+- Add natural flow and personality{context_note(context)}"""
 
-        except Exception as e:
-            print(f"OpenAI restructure error: {e}")
-            return text
+        return system_prompt, user_prompt
 
     def _apply_contractions(self, text: str, probability: float = 0.6) -> str:
         """Apply natural contractions"""
@@ -373,9 +434,36 @@ Requirements:
 
         return " ".join(humanized)
 
-    def _openai_advanced_paraphrase(self, text: str, burstiness: float, perplexity_target: int, temperature: float) -> str:
+    def _openai_advanced_paraphrase(self, text: str, burstiness: float, perplexity_target: int, temperature: float,
+                                    seed: Optional[int] = None, context: str = "") -> str:
         """Advanced paraphrasing with specific metrics targeting"""
 
+        system_prompt, user_prompt = self._paraphrase_prompts(text, burstiness, perplexity_target, context)
+
+        try:
+            messages = [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ]
+            response = chat_completion(
+                self.client,
+                model="gpt-4o-mini",
+                messages=messages,
+                temperature=temperature,
+                max_tokens=budget_max_tokens(messages, text),
+                presence_penalty=0.9,
+                frequency_penalty=0.7,
+                seed=seed
+            )
+
+            return response.choices[0].message.content.strip()
+
+        except Exception as e:
+            print(f"OpenAI paraphrase error: {e}")
+            # Restructuring already fell back to the local engine if the provider is down
+            return text
+
+    def _paraphrase_prompts(self, text: str, burstiness: float, perplexity_target: int, context: str = ""):
         system_prompt = f"""You are perfecting human-like text with these EXACT requirements:
 
 1. SENTENCE VARIATION:
@@ -415,26 +503,36 @@ Focus on:
 - Creating dramatic sentence length variation
 - Adding unexpected elements
 - Including natural speech patterns
-- Keeping it conversational but intelligent"""
+- Keeping it conversational but intelligent{context_note(context)}"""
+
+        return system_prompt, user_prompt
+
+    def _openai_fused_rewrite(self, text: str, tone: str, formality: float, burstiness: float,
+                              perplexity_target: int, temperature: float,
+                              seed: Optional[int] = None, context: str = "") -> str:
+        """Restructure and paraphrase in one completion instead of two"""
+        messages = fuse_passes(
+            *self._restructure_prompts(text, tone, formality, context),
+            *self._paraphrase_prompts(PASS_ONE_RESULT, burstiness, perplexity_target)
+        )
 
         try:
-            response = self.client.chat.completions.create(
+            response = chat_completion(
+                self.client,
                 model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
+                messages=messages,
                 temperature=temperature,
-                max_tokens=3000,
+                max_tokens=budget_max_tokens(messages, text),
                 presence_penalty=0.9,
-                frequency_penalty=0.7
+                frequency_penalty=0.7,
+                seed=seed
             )
 
             return response.choices[0].message.content.strip()
 
         except Exception as e:
-            print(f"OpenAI paraphrase error: {e}")
-            return text
+            print(f"OpenAI fused rewrite error: {e}")
+            return local_humanize(text, formality) or text
 
     def _final_polish(self, text: str) -> str:
         """Final quality check and polish"""
@@ -7,10 +7,15 @@ import textstat
 import nltk
 import numpy as np
 from typing import Dict, List, Optional, Tuple
-from openai import OpenAI
 import spacy
 from collections import Counter
 
+from llm_client import chat_completion, create_openai_client
+from llm_resilience import local_humanize
+from fused_passes import LLM_FUSED_PASSES, PASS_ONE_RESULT, fuse_passes
+from token_budget import budget_max_tokens
+from long_document import context_note, is_long_document, rewrite_chunks, split_document, stitch_document
+
 try:
     nltk.download('punkt_tab', quiet=True)
     nltk.download('punkt', quiet=True)
@@ -21,8 +26,9 @@ except:
     pass
 
 class UltimateHumanizationEngine:
-    def __init__(self):
-        self.client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+    def __init__(self, fused_passes: Optional[bool] = None):
+        self.client = create_openai_client()
+        self.fused_passes = LLM_FUSED_PASSES if fused_passes is None else fused_passes
         try:
             self.nlp = spacy.load("en_core_web_sm")
         except:
@@ -102,14 +108,23 @@ class UltimateHumanizationEngine:
         preserved_elements = self._extract_preserved_elements(text, preserve_citations, preserve_quotes)
         processed_text = self._preprocess(text, preserved_elements)
 
-        # RADICAL APPROACH: Complete rewrite with human patterns
-        humanized_text = self._radical_humanization(
-            processed_text, tone, formality, burstiness,
-            idiom_density, conciseness, temperature
-        )
+        if is_long_document(processed_text):
+            # Long documents: rewrite paragraph-aligned chunks concurrently, then add quirks per chunk
+            chunks, separators = split_document(processed_text)
+            chunks = rewrite_chunks(chunks, lambda chunk, context: self._radical_humanization(
+                chunk, tone, formality, burstiness,
+                idiom_density, conciseness, temperature, seed, None, context
+            ))
+            humanized_text = stitch_document([self._inject_human_quirks(chunk, formality) for chunk in chunks], separators)
+        else:
+            # RADICAL APPROACH: Complete rewrite with human patterns
+            humanized_text = self._radical_humanization(
+                processed_text, tone, formality, burstiness,
+                idiom_density, conciseness, temperature, seed, max_tokens
+            )
 
-        # Post-processing to add more human elements
-        humanized_text = self._inject_human_quirks(humanized_text, formality)
+            # Post-processing to add more human elements
+            humanized_text = self._inject_human_quirks(humanized_text, formality)
 
         # Restore preserved elements
         humanized_text = self._restore_preserved_elements(humanized_text, preserved_elements)
@@ -136,9 +151,76 @@ class UltimateHumanizationEngine:
         }
 
     def _radical_humanization(self, text, tone, formality, burstiness,
-                             idiom_density, conciseness, temperature):
+                             idiom_density, conciseness, temperature, seed=None, max_tokens=None,
+                             context=""):
         """Complete rewrite focusing on human speech patterns"""
 
+        try:
+            if self.fused_passes:
+                # Rewrite and chaos passes in one completion
+                messages = fuse_passes(
+                    *self._rewrite_prompts(text, tone, formality, burstiness, idiom_density, context),
+                    *self._chaos_prompts(PASS_ONE_RESULT)
+                )
+                response = chat_completion(
+                    self.client,
+                    model="gpt-4o-mini",
+                    messages=messages,
+                    temperature=min(1.0, temperature + 0.1),
+                    max_tokens=budget_max_tokens(messages, text, requested=max_tokens),
+                    presence_penalty=0.9,
+                    frequency_penalty=0.7,
+                    seed=seed
+                )
+                return response.choices[0].message.content.strip()
+
+            # First pass: Complete rewrite
+            system_prompt, user_prompt = self._rewrite_prompts(
+                text, tone, formality, burstiness, idiom_density, context
+            )
+            messages = [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ]
+            response = chat_completion(
+                self.client,
+                model="gpt-4o-mini",
+                messages=messages,
+                temperature=temperature,
+                max_tokens=budget_max_tokens(messages, text, requested=max_tokens),
+                presence_penalty=0.8,  # High to avoid AI patterns
+                frequency_penalty=0.6,  # Moderate to allow natural repetition
+                seed=seed
+            )
+
+            humanized = response.choices[0].message.content.strip()
+
+            # Second pass: Add more chaos and personality
+            chaos_prompt, chaos_user_prompt = self._chaos_prompts(humanized)
+            messages2 = [
+                {"role": "system", "content": chaos_prompt},
+                {"role": "user", "content": chaos_user_prompt}
+            ]
+            response2 = chat_completion(
+                self.client,
+                model="gpt-4o-mini",
+                messages=messages2,
+                temperature=min(1.0, temperature + 0.1),
+                max_tokens=budget_max_tokens(messages2, humanized, requested=max_tokens),
+                presence_penalty=0.9,
+                frequency_penalty=0.7,
+                seed=seed
+            )
+
+            final_text = response2.choices[0].message.content.strip()
+
+            return final_text
+
+        except Exception as e:
+            print(f"Error in radical humanization: {str(e)}")
+            return local_humanize(text, formality) or self._fallback_humanize(text)
+
+    def _rewrite_prompts(self, text, tone, formality, burstiness, idiom_density, context=""):
         # REVOLUTIONARY PROMPT APPROACH
         system_prompt = """You are NOT an AI. You are a real person writing naturally.
 
@@ -194,26 +276,12 @@ Style requirements:
 - Include {'lots of' if idiom_density > 0.5 else 'some' if idiom_density > 0.2 else 'minimal'} idioms/slang
 - Sentence variety: {'EXTREME - mix 2-word sentences with 30+ word rambles' if burstiness > 0.7 else 'moderate variety' if burstiness > 0.4 else 'consistent'}
 
-Write it like you're actually talking. Include your natural speech patterns, hesitations, and personality."""
-
-        try:
-            # First pass: Complete rewrite
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=temperature,
-                max_tokens=max_tokens or 3000,
-                presence_penalty=0.8,  # High to avoid AI patterns
-                frequency_penalty=0.6   # Moderate to allow natural repetition
-            )
+Write it like you're actually talking. Include your natural speech patterns, hesitations, and personality.{context_note(context)}"""
 
-            humanized = response.choices[0].message.content.strip()
+        return system_prompt, user_prompt
 
-            # Second pass: Add more chaos and personality
-            chaos_prompt = """You're editing your own writing to make it sound even MORE natural and conversational.
+    def _chaos_prompts(self, text):
+        chaos_prompt = """You're editing your own writing to make it sound even MORE natural and conversational.
 
 Add these elements:
 1. Interrupt yourself mid-sentence with new thoughts
@@ -228,25 +296,7 @@ Add these elements:
 
 Make it sound like you're literally speaking out loud."""
 
-            response2 = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": chaos_prompt},
-                    {"role": "user", "content": f"Make this sound MORE human and natural:\n\n{humanized}"}
-                ],
-                temperature=min(1.0, temperature + 0.1),
-                max_tokens=max_tokens or 3000,
-                presence_penalty=0.9,
-                frequency_penalty=0.7
-            )
-
-            final_text = response2.choices[0].message.content.strip()
-
-            return final_text
-
-        except Exception as e:
-            print(f"Error in radical humanization: {str(e)}")
-            return self._fallback_humanize(text)
+        return chaos_prompt, f"Make this sound MORE human and natural:\n\n{text}"
 
     def _inject_human_quirks(self, text: str, formality: float) -> str:
         """Add subtle human writing quirks"""
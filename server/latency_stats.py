@@ -0,0 +1,243 @@
+import os
+import math
+import time
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+
+import redis
+
+LATENCY_STATS_BACKEND = os.getenv("LATENCY_STATS_BACKEND", "memory")  # memory, redis or none
+LATENCY_BUCKET_SECONDS = int(os.getenv("LATENCY_BUCKET_SECONDS", "3600"))
+LATENCY_RETENTION_DAYS = int(os.getenv("LATENCY_RETENTION_DAYS", "30"))
+LATENCY_RELATIVE_ACCURACY = float(os.getenv("LATENCY_RELATIVE_ACCURACY", "0.01"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+
+# Latencies at or below this (seconds) share the zero bin
+MIN_LATENCY = 1e-3
+
+# Every scope also keeps an all-time sketch, so overall stats are a single read
+ALL_TIME = "all"
+
+class DDSketch:
+    """Mergeable quantile sketch with bounded relative error (DDSketch, log-spaced bins)"""
+
+    def __init__(self, relative_accuracy: float = LATENCY_RELATIVE_ACCURACY):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.bins = defaultdict(int)
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+
+    def index(self, value: float) -> Optional[int]:
+        """Bin of a value, None for the zero bin"""
+        if value <= MIN_LATENCY:
+            return None
+        return math.ceil(math.log(value) / self.log_gamma)
+
+    def add(self, value: float):
+        index = self.index(value)
+        if index is None:
+            self.zero_count += 1
+        else:
+            self.bins[index] += 1
+        self.count += 1
+        self.sum += value
+
+    def merge(self, other: "DDSketch"):
+        for index, count in other.bins.items():
+            self.bins[index] += count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+
+    def quantile(self, q: float) -> Optional[float]:
+        if self.count == 0:
+            return None
+
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if seen > rank:
+            return 0.0
+
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if seen > rank:
+                # Midpoint of the bin in relative terms
+                return 2 * self.gamma ** index / (self.gamma + 1)
+
+        return 2 * self.gamma ** max(self.bins) / (self.gamma + 1)
+
+    def summary(self) -> Dict:
+        def rounded(value):
+            return round(value, 3) if value is not None else None
+
+        return {
+            'count': self.count,
+            'mean': rounded(self.sum / self.count) if self.count else None,
+            'p50': rounded(self.quantile(0.5)),
+            'p95': rounded(self.quantile(0.95)),
+            'p99': rounded(self.quantile(0.99))
+        }
+
+class MemorySketchStore:
+    """Sketches per (scope, bucket) in this process"""
+
+    def __init__(self):
+        self.sketches: Dict[tuple, DDSketch] = {}
+        self.scopes = defaultdict(set)
+        self.lock = threading.Lock()
+
+    def add(self, scope: str, buckets: List[str], value: float):
+        with self.lock:
+            self.scopes[scope.split(":", 1)[0]].add(scope)
+            for bucket in buckets:
+                sketch = self.sketches.get((scope, bucket))
+                if sketch is None:
+                    sketch = self.sketches[(scope, bucket)] = DDSketch()
+                sketch.add(value)
+
+    def load(self, scope: str, buckets: Iterable[str]) -> DDSketch:
+        merged = DDSketch()
+        with self.lock:
+            for bucket in buckets:
+                sketch = self.sketches.get((scope, bucket))
+                if sketch is not None:
+                    merged.merge(sketch)
+        return merged
+
+    def list_scopes(self, kind: str) -> List[str]:
+        with self.lock:
+            return sorted(self.scopes[kind])
+
+    def prune(self, oldest_bucket: int):
+        with self.lock:
+            for key in [k for k in self.sketches if k[1] != ALL_TIME and int(k[1]) < oldest_bucket]:
+                del self.sketches[key]
+
+class RedisSketchStore:
+    """Sketches as Redis hashes of bin counts; HINCRBY makes updates from every worker merge"""
+
+    def __init__(self, url: str = REDIS_URL, prefix: str = "latency"):
+        self.client = redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+        self.retention = LATENCY_RETENTION_DAYS * 86400
+        self.template = DDSketch()
+
+    def add(self, scope: str, buckets: List[str], value: float):
+        index = self.template.index(value)
+        field = "z" if index is None else str(index)
+
+        pipe = self.client.pipeline()
+        pipe.sadd(f"{self.prefix}:scopes:{scope.split(':', 1)[0]}", scope)
+        for bucket in buckets:
+            key = f"{self.prefix}:{scope}:{bucket}"
+            pipe.hincrby(key, field, 1)
+            pipe.hincrby(key, "n", 1)
+            pipe.hincrbyfloat(key, "s", value)
+            if bucket != ALL_TIME:
+                pipe.expire(key, self.retention)
+        pipe.execute()
+
+    def load(self, scope: str, buckets: Iterable[str]) -> DDSketch:
+        pipe = self.client.pipeline()
+        for bucket in buckets:
+            pipe.hgetall(f"{self.prefix}:{scope}:{bucket}")
+
+        merged = DDSketch()
+        for fields in pipe.execute():
+            for field, value in fields.items():
+                if field == "n":
+                    merged.count += int(value)
+                elif field == "s":
+                    merged.sum += float(value)
+                elif field == "z":
+                    merged.zero_count += int(value)
+                else:
+                    merged.bins[int(field)] += int(value)
+        return merged
+
+    def list_scopes(self, kind: str) -> List[str]:
+        return sorted(self.client.smembers(f"{self.prefix}:scopes:{kind}"))
+
+    def prune(self, oldest_bucket: int):
+        # Bucket keys expire on their own
+        pass
+
+class LatencyStats:
+    """Processing-time percentiles per user, engine and stage, kept in hourly sketches"""
+
+    def __init__(self, store, bucket_seconds: int = LATENCY_BUCKET_SECONDS):
+        self.store = store
+        self.bucket_seconds = bucket_seconds
+        self.retention_buckets = math.ceil(LATENCY_RETENTION_DAYS * 86400 / bucket_seconds)
+        self.pruned_bucket = None
+        self.errors = 0
+
+    def bucket(self, timestamp: Optional[float] = None) -> int:
+        return int((timestamp or time.time()) // self.bucket_seconds)
+
+    def record(self, scope: str, seconds: float, timestamp: Optional[float] = None):
+        bucket = self.bucket(timestamp)
+        try:
+            self.store.add(scope, [str(bucket), ALL_TIME], max(0.0, seconds))
+
+            # Drop expired buckets once per new bucket
+            if bucket != self.pruned_bucket:
+                self.pruned_bucket = bucket
+                self.store.prune(bucket - self.retention_buckets)
+        except Exception as e:
+            print(f"Latency stats write error: {e}")
+            self.errors += 1
+
+    def record_job(self, user_id: str, engine: str, total: float, stages: Optional[Dict[str, float]] = None):
+        self.record(f"user:{user_id}", total)
+        self.record(f"engine:{engine}", total)
+        for stage, seconds in (stages or {}).items():
+            self.record(f"stage:{stage}", seconds)
+
+    def summary(self, scope: str, hours: Optional[int] = None) -> Dict:
+        """Percentiles over the last hours (merging their buckets), or all time"""
+        if hours is None:
+            buckets = [ALL_TIME]
+        else:
+            latest = self.bucket()
+            count = max(1, math.ceil(hours * 3600 / self.bucket_seconds))
+            buckets = [str(b) for b in range(latest - count + 1, latest + 1)]
+
+        try:
+            return self.store.load(scope, buckets).summary()
+        except Exception as e:
+            print(f"Latency stats read error: {e}")
+            self.errors += 1
+            return DDSketch().summary()
+
+    def summaries(self, kind: str, hours: Optional[int] = None) -> Dict[str, Dict]:
+        """Summaries for every engine or stage scope"""
+        prefix = f"{kind}:"
+        try:
+            scopes = self.store.list_scopes(kind)
+        except Exception as e:
+            print(f"Latency stats read error: {e}")
+            self.errors += 1
+            scopes = []
+        return {scope[len(prefix):]: self.summary(scope, hours) for scope in scopes}
+
+_stats = None
+_stats_lock = threading.Lock()
+
+def get_latency_stats() -> Optional[LatencyStats]:
+    """Return the process-wide latency statistics, or None when disabled"""
+    global _stats
+
+    if LATENCY_STATS_BACKEND == "none":
+        return None
+
+    if _stats is None:
+        with _stats_lock:
+            if _stats is None:
+                store = RedisSketchStore() if LATENCY_STATS_BACKEND == "redis" else MemorySketchStore()
+                _stats = LatencyStats(store)
+
+    return _stats
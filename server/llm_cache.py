@@ -0,0 +1,163 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import redis
+
+LLM_CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", "memory")  # memory, redis or none
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", "86400"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+
+# Request fields that change what the model returns
+KEY_FIELDS = [
+    'model', 'messages', 'temperature', 'max_tokens', 'seed',
+    'presence_penalty', 'frequency_penalty', 'top_p'
+]
+
+class MemoryCacheBackend:
+    """In-process LRU cache with per-entry expiry"""
+
+    def __init__(self, max_entries: int = LLM_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+
+            value, expires_at = entry
+            if expires_at < time.time():
+                del self.entries[key]
+                return None
+
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl: int):
+        with self.lock:
+            self.entries[key] = (value, time.time() + ttl)
+            self.entries.move_to_end(key)
+
+            # Evict least recently used entries beyond the size bound
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def size(self) -> int:
+        return len(self.entries)
+
+class RedisCacheBackend:
+    """Redis cache shared by every worker, bounded through an insertion index"""
+
+    def __init__(self, url: str = REDIS_URL, max_entries: int = LLM_CACHE_MAX_ENTRIES,
+                 prefix: str = "llm_cache"):
+        self.client = redis.from_url(url, decode_responses=True)
+        self.max_entries = max_entries
+        self.prefix = prefix
+        self.index_key = f"{prefix}:index"
+
+    def get(self, key: str) -> Optional[str]:
+        return self.client.get(f"{self.prefix}:{key}")
+
+    def set(self, key: str, value: str, ttl: int):
+        pipe = self.client.pipeline()
+        pipe.setex(f"{self.prefix}:{key}", ttl, value)
+        pipe.zadd(self.index_key, {key: time.time()})
+        pipe.execute()
+
+        # Drop the oldest entries once the index grows past the bound
+        overflow = self.client.zcard(self.index_key) - self.max_entries
+        if overflow > 0:
+            evicted = self.client.zpopmin(self.index_key, overflow)
+            if evicted:
+                self.client.delete(*[f"{self.prefix}:{k}" for k, _ in evicted])
+
+    def size(self) -> int:
+        return self.client.zcard(self.index_key)
+
+class LLMResponseCache:
+    """Content-addressed cache for chat completion responses"""
+
+    def __init__(self, backend, ttl: int = LLM_CACHE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def cacheable(self, params: Dict) -> bool:
+        # Without a seed (or greedy decoding) every call is meant to sample anew
+        if params.get('stream'):
+            return False
+        return params.get('seed') is not None or params.get('temperature') == 0
+
+    def key_for(self, params: Dict) -> str:
+        payload = {field: params.get(field) for field in KEY_FIELDS}
+        canonical = json.dumps(payload, sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict]:
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            print(f"LLM cache read error: {e}")
+            self.errors += 1
+            value = None
+
+        if value is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return json.loads(value)
+
+    def set(self, key: str, response: Dict):
+        try:
+            self.backend.set(key, json.dumps(response), self.ttl)
+        except Exception as e:
+            print(f"LLM cache write error: {e}")
+            self.errors += 1
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        try:
+            size = self.backend.size()
+        except Exception:
+            size = None
+
+        return {
+            'backend': type(self.backend).__name__,
+            'hits': self.hits,
+            'misses': self.misses,
+            'errors': self.errors,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'size': size
+        }
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_llm_cache() -> Optional[LLMResponseCache]:
+    """Return the process-wide response cache, or None when caching is disabled"""
+    global _cache
+
+    if LLM_CACHE_BACKEND == "none":
+        return None
+
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                if LLM_CACHE_BACKEND == "redis":
+                    backend = RedisCacheBackend()
+                else:
+                    backend = MemoryCacheBackend()
+                _cache = LLMResponseCache(backend)
+
+    return _cache
@@ -0,0 +1,99 @@
+import os
+import time
+import uuid
+from typing import Dict, Iterator
+
+from openai import OpenAI
+from openai.types.chat import ChatCompletion
+
+from llm_cache import get_llm_cache
+from llm_resilience import LLM_TIMEOUT, call_with_resilience, llm_breaker
+
+def create_openai_client() -> OpenAI:
+    # OPENAI_BASE_URL points the engines at another OpenAI-compatible server,
+    # e.g. fake_openai_server.py for offline benchmarks.
+    # Retries are handled by call_with_resilience, not by the SDK
+    return OpenAI(
+        api_key=os.getenv('OPENAI_API_KEY'),
+        base_url=os.getenv('OPENAI_BASE_URL') or None,
+        timeout=LLM_TIMEOUT,
+        max_retries=0
+    )
+
+def _cache_key(params: Dict):
+    cache = get_llm_cache()
+    key = cache.key_for(params) if cache and cache.cacheable(params) else None
+    return cache, key
+
+def _completion_from_text(model: str, content: str) -> Dict:
+    """Build a completion payload for a response that was assembled from stream deltas"""
+    return {
+        'id': f"chatcmpl-{uuid.uuid4().hex}",
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': model,
+        'choices': [{
+            'index': 0,
+            'finish_reason': 'stop',
+            'message': {'role': 'assistant', 'content': content}
+        }]
+    }
+
+def chat_completion(client, **params) -> ChatCompletion:
+    """Create a chat completion, serving repeated seeded requests from the response cache"""
+    if params.get('seed') is None:
+        params.pop('seed', None)
+
+    cache, key = _cache_key(params)
+
+    if key:
+        cached = cache.get(key)
+        if cached is not None:
+            return ChatCompletion.model_validate(cached)
+
+    response = call_with_resilience(lambda: client.chat.completions.create(**params))
+
+    if key:
+        cache.set(key, response.model_dump(mode='json'))
+
+    return response
+
+def stream_chat_completion(client, **params) -> Iterator[str]:
+    """Yield content deltas of a chat completion as they arrive from the model"""
+    if params.get('seed') is None:
+        params.pop('seed', None)
+
+    cache, key = _cache_key(params)
+
+    if key:
+        cached = cache.get(key)
+        if cached is not None:
+            # A cached response is replayed as a single delta
+            yield ChatCompletion.model_validate(cached).choices[0].message.content
+            return
+
+    parts = []
+    # The outcome is recorded once the stream ends, not when it opens
+    stream = call_with_resilience(lambda: client.chat.completions.create(stream=True, **params), settle=False)
+    try:
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                yield delta
+    except Exception:
+        # A stream dying midway counts against the provider
+        llm_breaker.record_failure()
+        raise
+    except BaseException:
+        # Abandoned by the consumer: no outcome, but a half-open probe must not stay pending
+        stream.close()
+        llm_breaker.release()
+        raise
+
+    llm_breaker.record_success()
+
+    if key:
+        cache.set(key, _completion_from_text(params['model'], ''.join(parts)))
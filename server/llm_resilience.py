@@ -0,0 +1,213 @@
+import os
+import time
+import random
+import threading
+from collections import deque
+from typing import Callable, Dict, Optional
+
+import openai
+
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "8"))
+
+BREAKER_FAILURE_RATE = float(os.getenv("LLM_BREAKER_FAILURE_RATE", "0.5"))
+BREAKER_MIN_CALLS = int(os.getenv("LLM_BREAKER_MIN_CALLS", "10"))
+BREAKER_WINDOW = float(os.getenv("LLM_BREAKER_WINDOW", "60"))
+BREAKER_RESET_TIMEOUT = float(os.getenv("LLM_BREAKER_RESET_TIMEOUT", "30"))
+
+# Provider-side failures worth retrying; anything else is a bug in the request
+RETRYABLE_ERRORS = (
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+# Jitter has its own generator so retries never disturb seeded engine randomness
+_jitter = random.Random()
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the provider while the breaker is open"""
+
+class CircuitBreaker:
+    """Error-rate circuit breaker over a sliding time window"""
+
+    def __init__(self, name: str, failure_rate: float = BREAKER_FAILURE_RATE,
+                 min_calls: int = BREAKER_MIN_CALLS, window: float = BREAKER_WINDOW,
+                 reset_timeout: float = BREAKER_RESET_TIMEOUT):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.reset_timeout = reset_timeout
+
+        self.state = "closed"
+        self.opened_at = None
+        self.probe_in_flight = False
+        self.outcomes = deque()
+        self.lock = threading.Lock()
+
+        self.calls = 0
+        self.failures = 0
+        self.rejected = 0
+        self.retries = 0
+        self.times_opened = 0
+
+    def allow(self) -> bool:
+        with self.lock:
+            if self.state == "open":
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    self.rejected += 1
+                    return False
+                self.state = "half_open"
+                self.probe_in_flight = False
+
+            if self.state == "half_open":
+                # Let a single probe through to test the provider
+                if self.probe_in_flight:
+                    self.rejected += 1
+                    return False
+                self.probe_in_flight = True
+
+            return True
+
+    def record_success(self):
+        with self.lock:
+            self.calls += 1
+            self._record(True)
+            if self.state == "half_open":
+                self.state = "closed"
+                self.probe_in_flight = False
+                self.outcomes.clear()
+
+    def release(self):
+        """Settle a call that ended without a provider outcome, so a half-open probe is not left pending"""
+        with self.lock:
+            self.probe_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.calls += 1
+            self.failures += 1
+            self._record(False)
+
+            if self.state == "half_open":
+                self._open()
+            elif self.state == "closed" and len(self.outcomes) >= self.min_calls:
+                failed = sum(1 for _, ok in self.outcomes if not ok)
+                if failed / len(self.outcomes) >= self.failure_rate:
+                    self._open()
+
+    def _record(self, ok: bool):
+        now = time.monotonic()
+        self.outcomes.append((now, ok))
+        while self.outcomes and now - self.outcomes[0][0] > self.window:
+            self.outcomes.popleft()
+
+    def _open(self):
+        self.state = "open"
+        self.opened_at = time.monotonic()
+        self.probe_in_flight = False
+        self.times_opened += 1
+        print(f"Circuit breaker '{self.name}' opened")
+
+    def stats(self) -> Dict:
+        with self.lock:
+            window_calls = len(self.outcomes)
+            window_failures = sum(1 for _, ok in self.outcomes if not ok)
+            return {
+                'state': self.state,
+                'calls': self.calls,
+                'failures': self.failures,
+                'rejected': self.rejected,
+                'retries': self.retries,
+                'times_opened': self.times_opened,
+                'window_calls': window_calls,
+                'window_error_rate': round(window_failures / window_calls, 4) if window_calls else 0.0
+            }
+
+llm_breaker = CircuitBreaker("openai")
+
+def _backoff_delay(attempt: int, error: Exception) -> float:
+    # Full jitter: uniform over [0, base * 2^attempt], capped
+    delay = _jitter.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * (2 ** attempt)))
+
+    # Respect the provider's Retry-After on rate limits
+    response = getattr(error, 'response', None)
+    retry_after = response.headers.get('retry-after') if response is not None else None
+    if retry_after:
+        try:
+            delay = max(delay, min(LLM_BACKOFF_MAX, float(retry_after)))
+        except ValueError:
+            pass
+
+    return delay
+
+def call_with_resilience(call: Callable, breaker: CircuitBreaker = llm_breaker,
+                         max_retries: int = LLM_MAX_RETRIES, settle: bool = True):
+    """Run a provider call with jittered exponential retries behind the circuit breaker.
+
+    With settle=False a successful call records no outcome: the caller records one
+    (or releases the breaker) once the result, e.g. a stream, has been consumed.
+    """
+    attempt = 0
+    while True:
+        if not breaker.allow():
+            raise CircuitOpenError(f"Circuit breaker '{breaker.name}' is open")
+
+        try:
+            result = call()
+        except RETRYABLE_ERRORS as e:
+            breaker.record_failure()
+            if attempt >= max_retries:
+                raise
+            delay = _backoff_delay(attempt, e)
+            print(f"LLM call failed ({type(e).__name__}), retrying in {delay:.2f}s")
+            with breaker.lock:
+                breaker.retries += 1
+            attempt += 1
+            time.sleep(delay)
+            continue
+        except openai.APIError:
+            # The provider answered, it just rejected the request: not an outage
+            breaker.record_success()
+            raise
+        except BaseException:
+            breaker.release()
+            raise
+
+        if settle:
+            breaker.record_success()
+        return result
+
+_local_humanizer = None
+_local_lock = threading.Lock()
+
+def local_humanize(text: str, formality: float = 0.5) -> Optional[str]:
+    """Humanize text without the provider, using the exact algorithm or the local GPT-2 engine"""
+    global _local_humanizer
+
+    try:
+        with _local_lock:
+            if _local_humanizer is None:
+                try:
+                    from humanizer_exact import AdvancedAIHumanizer
+                    _local_humanizer = AdvancedAIHumanizer()
+                except ImportError:
+                    from humanizer import HumanizationEngine
+                    _local_humanizer = HumanizationEngine()
+
+        if hasattr(_local_humanizer, 'humanize_text'):
+            # Same formality-to-intensity mapping as ExactHumanizationEngine
+            intensity = "heavy" if formality < 0.3 else "standard" if formality < 0.6 else "light"
+            result = _local_humanizer.humanize_text(text, intensity)
+            # humanize_text reports failures in its return value
+            return None if result.startswith("Error processing text") else result
+
+        return _local_humanizer.humanize(text, formality=formality)['humanized_text']
+
+    except Exception as e:
+        print(f"Local humanization fallback failed: {e}")
+        return None
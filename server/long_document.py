@@ -0,0 +1,67 @@
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+from token_budget import count_tokens, join_chunks, split_text_with_separators
+
+# Documents above this size are rewritten as concurrent paragraph-aligned chunks
+LONG_DOCUMENT_TOKENS = int(os.getenv("LONG_DOCUMENT_TOKENS", "1500"))
+LONG_DOCUMENT_CHUNK_TOKENS = int(os.getenv("LONG_DOCUMENT_CHUNK_TOKENS", "800"))
+LONG_DOCUMENT_WORKERS = int(os.getenv("LONG_DOCUMENT_WORKERS", "4"))
+OVERLAP_WORDS = 40
+
+PLACEHOLDER_PATTERN = re.compile(r'__(?:CITATION|QUOTE)_\d+__')
+
+def is_long_document(text: str) -> bool:
+    return count_tokens(text) > LONG_DOCUMENT_TOKENS
+
+def split_document(text: str) -> Tuple[List[str], List[str]]:
+    """Split on paragraph boundaries, returning the chunks and the separators between them;
+    placeholders are single words and never split"""
+    return split_text_with_separators(text, LONG_DOCUMENT_CHUNK_TOKENS)
+
+def stitch_document(chunks: List[str], separators: List[str]) -> str:
+    """Rejoin rewritten chunks with the line breaks that separated them in the original"""
+    return join_chunks([chunk.strip() for chunk in chunks], separators)
+
+def overlap_context(previous_chunk: Optional[str]) -> str:
+    """Tail of the preceding chunk, given to the model for continuity only"""
+    if not previous_chunk:
+        return ""
+    return ' '.join(previous_chunk.split()[-OVERLAP_WORDS:])
+
+def context_note(context: str) -> str:
+    """Prompt suffix telling the model what precedes the chunk it is rewriting"""
+    if not context:
+        return ""
+    return f"""
+
+This passage continues directly from: "...{context}"
+Use that only for continuity. Do not rewrite or repeat it, and keep placeholders like __CITATION_0__ exactly as written."""
+
+def rewrite_chunks(
+    chunks: List[str],
+    rewrite: Callable[[str, str], str],
+    max_workers: int = LONG_DOCUMENT_WORKERS
+) -> List[str]:
+    """Run rewrite(chunk, context) over all chunks concurrently, returning results in order"""
+    contexts = [overlap_context(chunks[i - 1] if i > 0 else None) for i in range(len(chunks))]
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks)))) as pool:
+        futures = [
+            pool.submit(_rewrite_chunk, rewrite, chunk, context)
+            for chunk, context in zip(chunks, contexts)
+        ]
+        return [future.result() for future in futures]
+
+def _rewrite_chunk(rewrite: Callable[[str, str], str], chunk: str, context: str) -> str:
+    result = rewrite(chunk, context)
+
+    # A chunk that lost a placeholder would lose its citation or quote on restore
+    missing = set(PLACEHOLDER_PATTERN.findall(chunk)) - set(PLACEHOLDER_PATTERN.findall(result))
+    if missing:
+        print(f"Chunk rewrite dropped placeholders {sorted(missing)}, keeping original chunk")
+        return chunk
+
+    return result
@@ -0,0 +1,54 @@
+import os
+import asyncio
+from logging.config import fileConfig
+
+from alembic import context
+from dotenv import load_dotenv
+from sqlalchemy import pool
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from database import async_database_url
+
+load_dotenv()
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./noshitai.db")
+
+def get_metadata():
+    # The app's models, for `alembic revision --autogenerate`
+    from app import Base
+    return Base.metadata
+
+def run_migrations_offline():
+    context.configure(
+        url=DATABASE_URL,
+        target_metadata=None,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"}
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+def do_run_migrations(connection):
+    context.configure(connection=connection, target_metadata=get_metadata())
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+async def run_migrations_online():
+    # Same async driver as the app, so one DATABASE_URL serves both
+    connectable = create_async_engine(async_database_url(DATABASE_URL), poolclass=pool.NullPool)
+
+    async with connectable.connect() as connection:
+        await connection.run_sync(do_run_migrations)
+
+    await connectable.dispose()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    asyncio.run(run_migrations_online())
@@ -0,0 +1,120 @@
+"""Base tables, compressed job texts and (user_id, created_at) listing indexes
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+
+Databases created by earlier versions (Base.metadata.create_all) are
+brought up to date; anything that already exists is left alone, so
+databases created by this version can run it as well. On an empty
+database the original tables are created first. The checks need a live
+connection, so run it online rather than with --sql.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+JOB_TEXT_COLUMNS = [
+    sa.Column("input_digest", sa.String(64)),
+    sa.Column("output_digest", sa.String(64)),
+    sa.Column("input_preview", sa.String(100)),
+]
+
+LISTING_INDEXES = [
+    ("ix_processing_jobs_user_created", "processing_jobs"),
+    ("ix_style_profiles_user_created", "style_profiles"),
+]
+
+
+def create_base_tables(tables) -> None:
+    """The schema as it was before migrations, for databases the API has not created yet"""
+    if "users" not in tables:
+        op.create_table(
+            "users",
+            sa.Column("id", sa.String, primary_key=True),
+            sa.Column("email", sa.String, nullable=False),
+            sa.Column("hashed_password", sa.String, nullable=False),
+            sa.Column("full_name", sa.String),
+            sa.Column("is_active", sa.Boolean),
+            sa.Column("is_premium", sa.Boolean),
+            sa.Column("stripe_customer_id", sa.String),
+            sa.Column("credits", sa.Integer),
+            sa.Column("created_at", sa.DateTime),
+            sa.Column("last_login", sa.DateTime),
+            sa.Column("settings", sa.JSON),
+        )
+        op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    if "style_profiles" not in tables:
+        op.create_table(
+            "style_profiles",
+            sa.Column("id", sa.String, primary_key=True),
+            sa.Column("user_id", sa.String),
+            sa.Column("name", sa.String),
+            sa.Column("description", sa.Text),
+            sa.Column("parameters", sa.JSON),
+            sa.Column("sample_text", sa.Text),
+            sa.Column("metrics", sa.JSON),
+            sa.Column("created_at", sa.DateTime),
+        )
+        op.create_index("ix_style_profiles_user_id", "style_profiles", ["user_id"])
+
+    if "processing_jobs" not in tables:
+        op.create_table(
+            "processing_jobs",
+            sa.Column("id", sa.String, primary_key=True),
+            sa.Column("user_id", sa.String),
+            sa.Column("status", sa.String),
+            sa.Column("input_text", sa.Text),
+            sa.Column("output_text", sa.Text),
+            sa.Column("parameters", sa.JSON),
+            sa.Column("metrics", sa.JSON),
+            sa.Column("created_at", sa.DateTime),
+            sa.Column("completed_at", sa.DateTime),
+            sa.Column("error_message", sa.Text),
+            sa.Column("watermark_id", sa.String),
+        )
+        op.create_index("ix_processing_jobs_user_id", "processing_jobs", ["user_id"])
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    tables = inspector.get_table_names()
+    create_base_tables(tables)
+
+    if "text_blobs" not in tables:
+        op.create_table(
+            "text_blobs",
+            sa.Column("digest", sa.String(64), primary_key=True),
+            sa.Column("data", sa.LargeBinary, nullable=False),
+            sa.Column("size", sa.Integer),
+            sa.Column("created_at", sa.DateTime),
+        )
+
+    existing = {c["name"] for c in inspector.get_columns("processing_jobs")}
+    for column in JOB_TEXT_COLUMNS:
+        if column.name not in existing:
+            op.add_column("processing_jobs", column)
+
+    for name, table in LISTING_INDEXES:
+        if name not in {i["name"] for i in inspector.get_indexes(table)}:
+            op.create_index(name, table, ["user_id", "created_at"])
+
+
+def downgrade() -> None:
+    for name, table in LISTING_INDEXES:
+        op.drop_index(name, table_name=table)
+
+    with op.batch_alter_table("processing_jobs") as batch:
+        for column in JOB_TEXT_COLUMNS:
+            batch.drop_column(column.name)
+
+    op.drop_table("text_blobs")
+    # The base tables are kept: they may hold data from before migrations
@@ -0,0 +1,50 @@
+"""Archive table for jobs past the retention age
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+
+    if "archived_jobs" not in inspector.get_table_names():
+        op.create_table(
+            "archived_jobs",
+            sa.Column("id", sa.String, primary_key=True),
+            sa.Column("user_id", sa.String),
+            sa.Column("status", sa.String),
+            sa.Column("input_digest", sa.String(64)),
+            sa.Column("output_digest", sa.String(64)),
+            sa.Column("input_preview", sa.String(100)),
+            sa.Column("parameters", sa.JSON),
+            sa.Column("metrics", sa.JSON),
+            sa.Column("created_at", sa.DateTime),
+            sa.Column("completed_at", sa.DateTime),
+            sa.Column("error_message", sa.Text),
+            sa.Column("watermark_id", sa.String),
+            sa.Column("archived_at", sa.DateTime),
+        )
+        op.create_index("ix_archived_jobs_user_created", "archived_jobs", ["user_id", "created_at"])
+
+    # The retention pass selects by age across all users
+    if "ix_processing_jobs_created" not in {i["name"] for i in inspector.get_indexes("processing_jobs")}:
+        op.create_index("ix_processing_jobs_created", "processing_jobs", ["created_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_processing_jobs_created", table_name="processing_jobs")
+    op.drop_index("ix_archived_jobs_user_created", table_name="archived_jobs")
+    op.drop_table("archived_jobs")
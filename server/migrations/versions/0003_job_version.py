@@ -0,0 +1,33 @@
+"""Job version counter for ETags on the job endpoint
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ("processing_jobs", "archived_jobs")
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+
+    for table in TABLES:
+        if "version" not in {c["name"] for c in inspector.get_columns(table)}:
+            op.add_column(table, sa.Column("version", sa.Integer, nullable=False, server_default="1"))
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        with op.batch_alter_table(table) as batch:
+            batch.drop_column("version")
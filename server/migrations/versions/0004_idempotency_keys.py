@@ -0,0 +1,38 @@
+"""Idempotency keys for replaying retried humanize requests
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+
+    # Databases the API has already started on have it from create_all
+    if "idempotency_keys" not in inspector.get_table_names():
+        op.create_table(
+            "idempotency_keys",
+            sa.Column("user_id", sa.String, primary_key=True),
+            sa.Column("key", sa.String, primary_key=True),
+            sa.Column("request_hash", sa.String, nullable=False),
+            sa.Column("job_id", sa.String, nullable=False),
+            sa.Column("created_at", sa.DateTime),
+        )
+        op.create_index("ix_idempotency_keys_created_at", "idempotency_keys", ["created_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_idempotency_keys_created_at", table_name="idempotency_keys")
+    op.drop_table("idempotency_keys")
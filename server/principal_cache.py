@@ -0,0 +1,126 @@
+import os
+import json
+import hashlib
+import threading
+from collections import defaultdict
+from typing import Dict, Optional
+
+import redis
+
+from llm_cache import MemoryCacheBackend
+
+PRINCIPAL_CACHE_BACKEND = os.getenv("PRINCIPAL_CACHE_BACKEND", "memory")  # memory, redis or none
+PRINCIPAL_CACHE_TTL = int(os.getenv("PRINCIPAL_CACHE_TTL", "30"))
+PRINCIPAL_CACHE_MAX_ENTRIES = int(os.getenv("PRINCIPAL_CACHE_MAX_ENTRIES", "10000"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+
+def token_key(token: str) -> str:
+    # Tokens are never stored, only their hash
+    return hashlib.sha256(token.encode()).hexdigest()
+
+class PrincipalCache:
+    """Short-lived cache of authenticated users by token, invalidated per user"""
+
+    def __init__(self, redis_client=None, ttl: int = PRINCIPAL_CACHE_TTL,
+                 max_entries: int = PRINCIPAL_CACHE_MAX_ENTRIES, prefix: str = "principal"):
+        self.local = MemoryCacheBackend(max_entries=max_entries)
+        self.redis = redis_client
+        self.ttl = ttl
+        self.prefix = prefix
+        # user id -> token keys, so credit changes can drop every session of the user
+        self.user_tokens = defaultdict(set)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def get(self, token: str) -> Optional[Dict]:
+        key = token_key(token)
+        value = self.local.get(key)
+
+        if value is None and self.redis is not None:
+            try:
+                value = self.redis.get(f"{self.prefix}:{key}")
+            except Exception as e:
+                print(f"Principal cache read error: {e}")
+                self.errors += 1
+            if value is not None:
+                principal = json.loads(value)
+                self._set_local(key, principal['id'], value)
+
+        if value is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return json.loads(value)
+
+    def set(self, token: str, principal: Dict):
+        key = token_key(token)
+        value = json.dumps(principal, default=str)
+        self._set_local(key, principal['id'], value)
+
+        if self.redis is not None:
+            try:
+                pipe = self.redis.pipeline()
+                pipe.setex(f"{self.prefix}:{key}", self.ttl, value)
+                pipe.sadd(f"{self.prefix}:user:{principal['id']}", key)
+                pipe.expire(f"{self.prefix}:user:{principal['id']}", self.ttl)
+                pipe.execute()
+            except Exception as e:
+                print(f"Principal cache write error: {e}")
+                self.errors += 1
+
+    def invalidate_user(self, user_id: str):
+        """Drop every cached session of the user, e.g. after its credits change"""
+        with self.lock:
+            keys = self.user_tokens.pop(user_id, set())
+        with self.local.lock:
+            for key in keys:
+                self.local.entries.pop(key, None)
+
+        if self.redis is not None:
+            try:
+                index = f"{self.prefix}:user:{user_id}"
+                keys = self.redis.smembers(index)
+                self.redis.delete(index, *[f"{self.prefix}:{key}" for key in keys])
+            except Exception as e:
+                print(f"Principal cache invalidation error: {e}")
+                self.errors += 1
+
+    def _set_local(self, key: str, user_id: str, value: str):
+        self.local.set(key, value, self.ttl)
+        with self.lock:
+            # Forget tokens whose entries expired or were evicted
+            tokens = {k for k in self.user_tokens[user_id] if k in self.local.entries}
+            tokens.add(key)
+            self.user_tokens[user_id] = tokens
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'backend': "redis" if self.redis is not None else "memory",
+            'hits': self.hits,
+            'misses': self.misses,
+            'errors': self.errors,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'local_size': self.local.size()
+        }
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_principal_cache() -> Optional[PrincipalCache]:
+    """Return the process-wide principal cache, or None when caching is disabled"""
+    global _cache
+
+    if PRINCIPAL_CACHE_BACKEND == "none":
+        return None
+
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                client = redis.from_url(REDIS_URL, decode_responses=True) if PRINCIPAL_CACHE_BACKEND == "redis" else None
+                _cache = PrincipalCache(client)
+
+    return _cache
@@ -0,0 +1,100 @@
+import os
+import json
+import threading
+from typing import Dict, Optional
+
+import redis
+
+from llm_cache import MemoryCacheBackend
+
+PROFILE_CACHE_BACKEND = os.getenv("PROFILE_CACHE_BACKEND", "memory")  # memory, redis or none
+PROFILE_CACHE_TTL = int(os.getenv("PROFILE_CACHE_TTL", "86400"))
+PROFILE_CACHE_MAX_ENTRIES = int(os.getenv("PROFILE_CACHE_MAX_ENTRIES", "10000"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+
+# Other workers only learn of a delete through Redis, so local entries live briefly
+LOCAL_TTL = int(os.getenv("PROFILE_CACHE_LOCAL_TTL", "60"))
+
+class ProfileParameterCache:
+    """Style-profile parameters by profile id: in-process LRU in front of Redis"""
+
+    def __init__(self, redis_client=None, ttl: int = PROFILE_CACHE_TTL,
+                 max_entries: int = PROFILE_CACHE_MAX_ENTRIES, prefix: str = "style_profile"):
+        self.local = MemoryCacheBackend(max_entries=max_entries)
+        self.redis = redis_client
+        self.ttl = ttl
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def get(self, profile_id: str) -> Optional[Dict]:
+        """Cached parameters for the profile; callers load and set() on a miss"""
+        value = self.local.get(profile_id)
+
+        if value is None and self.redis is not None:
+            try:
+                value = self.redis.get(f"{self.prefix}:{profile_id}")
+            except Exception as e:
+                print(f"Profile cache read error: {e}")
+                self.errors += 1
+            if value is not None:
+                self.local.set(profile_id, value, min(LOCAL_TTL, self.ttl))
+
+        if value is not None:
+            self.hits += 1
+            return json.loads(value)
+
+        self.misses += 1
+        return None
+
+    def set(self, profile_id: str, parameters: Dict):
+        value = json.dumps(parameters)
+        self.local.set(profile_id, value, min(LOCAL_TTL, self.ttl))
+
+        if self.redis is not None:
+            try:
+                self.redis.setex(f"{self.prefix}:{profile_id}", self.ttl, value)
+            except Exception as e:
+                print(f"Profile cache write error: {e}")
+                self.errors += 1
+
+    def invalidate(self, profile_id: str):
+        with self.local.lock:
+            self.local.entries.pop(profile_id, None)
+
+        if self.redis is not None:
+            try:
+                self.redis.delete(f"{self.prefix}:{profile_id}")
+            except Exception as e:
+                print(f"Profile cache invalidation error: {e}")
+                self.errors += 1
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'backend': "redis" if self.redis is not None else "memory",
+            'hits': self.hits,
+            'misses': self.misses,
+            'errors': self.errors,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'local_size': self.local.size()
+        }
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_profile_cache() -> Optional[ProfileParameterCache]:
+    """Return the process-wide profile cache, or None when caching is disabled"""
+    global _cache
+
+    if PROFILE_CACHE_BACKEND == "none":
+        return None
+
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                client = redis.from_url(REDIS_URL, decode_responses=True) if PROFILE_CACHE_BACKEND == "redis" else None
+                _cache = ProfileParameterCache(client)
+
+    return _cache
@@ -0,0 +1,121 @@
+import os
+import json
+import hashlib
+import threading
+from functools import lru_cache
+from typing import Dict, Optional
+
+from llm_cache import MemoryCacheBackend, RedisCacheBackend
+
+RESULT_CACHE_BACKEND = os.getenv("RESULT_CACHE_BACKEND", "memory")  # memory, redis or none
+RESULT_CACHE_TTL = int(os.getenv("RESULT_CACHE_TTL", "604800"))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "5000"))
+
+# Sources whose changes can change a humanization result
+ENGINE_MODULES = ["humanizer_exact.py", "humanizer.py", "token_budget.py"]
+
+# Request fields that never reach the engine; the profile is keyed by its resolved parameters
+IGNORED_FIELDS = {'style_profile_id'}
+
+@lru_cache(maxsize=1)
+def engine_version() -> str:
+    """Hash of the engine sources, plus ENGINE_VERSION for changes outside them (models, prompts)"""
+    digest = hashlib.sha256(os.getenv("ENGINE_VERSION", "").encode())
+    directory = os.path.dirname(os.path.abspath(__file__))
+
+    for name in ENGINE_MODULES:
+        path = os.path.join(directory, name)
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+
+    return digest.hexdigest()[:16]
+
+def request_key(parameters: Dict, version: Optional[str] = None) -> str:
+    """Canonical hash of the resolved parameters (text included) and the engine version"""
+    payload = {k: v for k, v in parameters.items() if k not in IGNORED_FIELDS}
+    canonical = json.dumps(
+        {'version': version or engine_version(), 'parameters': payload},
+        sort_keys=True, separators=(',', ':'), default=str
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+class ResultCache:
+    """Whole-result cache for repeated humanization requests"""
+
+    def __init__(self, backend, ttl: int = RESULT_CACHE_TTL, version: Optional[str] = None):
+        self.backend = backend
+        self.ttl = ttl
+        self.version = version or engine_version()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def cacheable(self, parameters: Dict) -> bool:
+        # Unseeded requests are meant to produce a fresh rewrite each time
+        return parameters.get('seed') is not None
+
+    def key_for(self, parameters: Dict) -> str:
+        return request_key(parameters, self.version)
+
+    def get(self, key: str) -> Optional[Dict]:
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            print(f"Result cache read error: {e}")
+            self.errors += 1
+            value = None
+
+        if value is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return json.loads(value)
+
+    def set(self, key: str, result: Dict):
+        # Only what complete_job reads is kept
+        entry = {'humanized_text': result['humanized_text'], 'metrics': result.get('metrics')}
+        try:
+            self.backend.set(key, json.dumps(entry, default=float), self.ttl)
+        except Exception as e:
+            print(f"Result cache write error: {e}")
+            self.errors += 1
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        try:
+            size = self.backend.size()
+        except Exception:
+            size = None
+
+        return {
+            'backend': type(self.backend).__name__,
+            'version': self.version,
+            'hits': self.hits,
+            'misses': self.misses,
+            'errors': self.errors,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'size': size
+        }
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_result_cache() -> Optional[ResultCache]:
+    """Return the process-wide result cache, or None when caching is disabled"""
+    global _cache
+
+    if RESULT_CACHE_BACKEND == "none":
+        return None
+
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                if RESULT_CACHE_BACKEND == "redis":
+                    backend = RedisCacheBackend(max_entries=RESULT_CACHE_MAX_ENTRIES, prefix="result_cache")
+                else:
+                    backend = MemoryCacheBackend(max_entries=RESULT_CACHE_MAX_ENTRIES)
+                _cache = ResultCache(backend)
+
+    return _cache
@@ -0,0 +1,117 @@
+import os
+import uuid
+import asyncio
+import threading
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional
+
+import redis
+
+RETENTION_BACKEND = os.getenv("RETENTION_BACKEND", "memory")  # memory, redis (one worker per pass) or none
+JOB_RETENTION_DAYS = int(os.getenv("JOB_RETENTION_DAYS", "90"))
+RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", "500"))
+RETENTION_INTERVAL = int(os.getenv("RETENTION_INTERVAL", "3600"))
+# Pause between batches so archiving never holds the table for long
+RETENTION_BATCH_PAUSE = float(os.getenv("RETENTION_BATCH_PAUSE", "0.5"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+
+# Archives up to batch_size jobs finished before the cutoff, returns how many it moved
+ArchiveBatch = Callable[[datetime, int], Awaitable[int]]
+
+class RetentionTask:
+    """Periodically moves finished jobs older than the retention age out of the hot table"""
+
+    def __init__(self, redis_client=None, retention_days: int = JOB_RETENTION_DAYS,
+                 batch_size: int = RETENTION_BATCH_SIZE, interval: int = RETENTION_INTERVAL,
+                 prefix: str = "retention"):
+        self.redis = redis_client
+        self.retention_days = retention_days
+        self.batch_size = batch_size
+        self.interval = interval
+        self.prefix = prefix
+        self.task: Optional[asyncio.Task] = None
+
+        self.passes = 0
+        self.archived = 0
+        self.errors = 0
+        self.last_run: Optional[datetime] = None
+
+    def start(self, archive_batch: ArchiveBatch):
+        if self.task is None:
+            self.task = asyncio.get_running_loop().create_task(self._loop(archive_batch))
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def _loop(self, archive_batch: ArchiveBatch):
+        while True:
+            try:
+                await self.run_once(archive_batch)
+            except Exception as e:
+                print(f"Job retention error: {e}")
+                self.errors += 1
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self, archive_batch: ArchiveBatch) -> int:
+        """One pass: archive batches until no expired jobs are left"""
+        if not self._acquire():
+            return 0
+
+        cutoff = datetime.utcnow() - timedelta(days=self.retention_days)
+        moved = 0
+        while True:
+            count = await archive_batch(cutoff, self.batch_size)
+            moved += count
+            self.archived += count
+            if count < self.batch_size:
+                break
+            await asyncio.sleep(RETENTION_BATCH_PAUSE)
+
+        self.passes += 1
+        self.last_run = datetime.utcnow()
+        return moved
+
+    def _acquire(self) -> bool:
+        # With several workers, whoever sets the key first runs this interval's pass
+        if self.redis is None:
+            return True
+        try:
+            return bool(self.redis.set(f"{self.prefix}:lock", uuid.uuid4().hex, nx=True, ex=self.interval))
+        except Exception as e:
+            print(f"Job retention lock error: {e}")
+            self.errors += 1
+            return False
+
+    def stats(self) -> Dict:
+        return {
+            'backend': "redis" if self.redis is not None else "memory",
+            'retention_days': self.retention_days,
+            'passes': self.passes,
+            'archived': self.archived,
+            'errors': self.errors,
+            'last_run': self.last_run.isoformat() if self.last_run else None
+        }
+
+_task = None
+_task_lock = threading.Lock()
+
+def get_retention_task() -> Optional[RetentionTask]:
+    """Return the process-wide retention task, or None when retention is disabled"""
+    global _task
+
+    if RETENTION_BACKEND == "none" or JOB_RETENTION_DAYS <= 0:
+        return None
+
+    if _task is None:
+        with _task_lock:
+            if _task is None:
+                client = redis.from_url(REDIS_URL, decode_responses=True) if RETENTION_BACKEND == "redis" else None
+                _task = RetentionTask(client)
+
+    return _task
@@ -0,0 +1,206 @@
+import os
+import json
+import time
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, Optional, Tuple
+
+import redis
+
+SINGLEFLIGHT_BACKEND = os.getenv("SINGLEFLIGHT_BACKEND", "memory")  # memory or redis
+SINGLEFLIGHT_TIMEOUT = int(os.getenv("SINGLEFLIGHT_TIMEOUT", "300"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+
+# Followers that subscribe just after the leader publishes read the result from here
+RESULT_TTL = 60
+
+class LeaderLostError(Exception):
+    """The job being followed in another process never reported a result"""
+
+class SingleFlight:
+    """Coalesces concurrent identical jobs onto one execution, in-process and across workers"""
+
+    def __init__(self, redis_client=None, timeout: int = SINGLEFLIGHT_TIMEOUT, prefix: str = "singleflight"):
+        self.redis = redis_client
+        self.timeout = timeout
+        self.prefix = prefix
+        self.flights: Dict[str, Future] = {}
+        self.lock = threading.Lock()
+
+        self.leaders = 0
+        self.coalesced = 0
+        self.remote_followers = 0
+        self.errors = 0
+
+    async def run(self, key: str, work: Callable[[], Dict]) -> Dict:
+        """Run work() in a thread unless an identical job is already running, then share its result"""
+        leader, future = self._join(key)
+
+        if not leader:
+            try:
+                return await self._wait(key, future)
+            except LeaderLostError as e:
+                print(f"{e}, running job locally")
+                return await asyncio.to_thread(work)
+
+        try:
+            result = await asyncio.to_thread(work)
+        except Exception as e:
+            self._finish(key, future, error=e)
+            raise
+        except BaseException:
+            # Cancelled: followers are released and run the job themselves
+            self._finish(key, future, error=LeaderLostError(f"Leader of job {key[:12]} was cancelled"))
+            raise
+
+        self._finish(key, future, result=result)
+        return result
+
+    async def _wait(self, key: str, future: Future) -> Dict:
+        # Shielded so a timed-out follower does not cancel the future the others share
+        try:
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), self.timeout)
+        except asyncio.TimeoutError:
+            with self.lock:
+                # The next identical job leads instead of waiting on the stuck one
+                if self.flights.get(key) is future:
+                    del self.flights[key]
+            raise LeaderLostError(f"No result for job {key[:12]} after {self.timeout}s")
+
+    def _join(self, key: str) -> Tuple[bool, Future]:
+        with self.lock:
+            future = self.flights.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return False, future
+
+            future = Future()
+            self.flights[key] = future
+
+        if self.redis is not None and not self._acquire_remote(key):
+            # Another worker leads; this process' followers share one wait on its result
+            with self.lock:
+                self.remote_followers += 1
+            threading.Thread(target=self._follow_remote, args=(key, future), daemon=True).start()
+            return False, future
+
+        with self.lock:
+            self.leaders += 1
+        return True, future
+
+    def _finish(self, key: str, future: Future, result: Optional[Dict] = None, error: Optional[Exception] = None):
+        with self.lock:
+            if self.flights.get(key) is future:
+                del self.flights[key]
+
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+        if self.redis is not None:
+            self._publish_remote(key, result, error)
+
+    def _acquire_remote(self, key: str) -> bool:
+        try:
+            return bool(self.redis.set(f"{self.prefix}:lock:{key}", "1", nx=True, ex=self.timeout))
+        except Exception as e:
+            # Without Redis every worker simply runs its own jobs
+            print(f"Singleflight lock error: {e}")
+            self.errors += 1
+            return True
+
+    def _publish_remote(self, key: str, result: Optional[Dict], error: Optional[Exception]):
+        if isinstance(error, LeaderLostError):
+            # Nothing to share: dropping the lock sends remote followers to run the job
+            try:
+                self.redis.delete(f"{self.prefix}:lock:{key}")
+            except Exception as e:
+                print(f"Singleflight publish error: {e}")
+                self.errors += 1
+            return
+
+        if error is not None:
+            message = {'error': str(error)}
+        else:
+            # Only what complete_job reads crosses processes
+            message = {'result': {
+                'humanized_text': result['humanized_text'],
+                'metrics': result.get('metrics')
+            }}
+
+        try:
+            payload = json.dumps(message, default=float)
+            pipe = self.redis.pipeline()
+            pipe.setex(f"{self.prefix}:result:{key}", RESULT_TTL, payload)
+            pipe.publish(f"{self.prefix}:channel:{key}", payload)
+            pipe.delete(f"{self.prefix}:lock:{key}")
+            pipe.execute()
+        except Exception as e:
+            print(f"Singleflight publish error: {e}")
+            self.errors += 1
+
+    def _follow_remote(self, key: str, future: Future):
+        payload = None
+        try:
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(f"{self.prefix}:channel:{key}")
+            try:
+                # Subscribe first, then check for a result published before we got here
+                payload = self.redis.get(f"{self.prefix}:result:{key}")
+                deadline = time.monotonic() + self.timeout
+
+                while payload is None and time.monotonic() < deadline:
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message['type'] == 'message':
+                        payload = message['data']
+                    elif not self.redis.exists(f"{self.prefix}:lock:{key}"):
+                        # Lock gone without a message: take the stored result if there is one
+                        payload = self.redis.get(f"{self.prefix}:result:{key}")
+                        break
+            finally:
+                pubsub.close()
+        except Exception as e:
+            print(f"Singleflight follow error: {e}")
+            self.errors += 1
+
+        with self.lock:
+            if self.flights.get(key) is future:
+                del self.flights[key]
+
+        if payload is None:
+            future.set_exception(LeaderLostError(f"No result for job {key[:12]} from its leader"))
+            return
+
+        message = json.loads(payload)
+        if 'error' in message:
+            future.set_exception(RuntimeError(message['error']))
+        else:
+            future.set_result(message['result'])
+
+    def stats(self) -> Dict:
+        with self.lock:
+            return {
+                'backend': "redis" if self.redis is not None else "memory",
+                'in_flight': len(self.flights),
+                'leaders': self.leaders,
+                'coalesced': self.coalesced,
+                'remote_followers': self.remote_followers,
+                'errors': self.errors
+            }
+
+_singleflight = None
+_singleflight_lock = threading.Lock()
+
+def get_singleflight() -> SingleFlight:
+    """Return the process-wide singleflight group"""
+    global _singleflight
+
+    if _singleflight is None:
+        with _singleflight_lock:
+            if _singleflight is None:
+                client = redis.from_url(REDIS_URL, decode_responses=True) if SINGLEFLIGHT_BACKEND == "redis" else None
+                _singleflight = SingleFlight(client)
+
+    return _singleflight
@@ -0,0 +1,79 @@
+import pytest
+
+from fake_openai_server import extract_text, transform
+from fused_passes import PASS_ONE_RESULT, fuse_passes
+
+DOCUMENT = "\n\n".join([
+    "It is important to note that the results are not final.",
+    "Furthermore, the team is not able to confirm the figures (Smith, 2021).",
+    "However, we are confident that the trend will not reverse.",
+    "In conclusion, it is clear that more work is needed.",
+    "The next report is due in the spring.",
+])
+
+def bare(module_name: str, class_name: str):
+    """Engine instance without __init__, which loads models; only prompt builders are used"""
+    module = pytest.importorskip(module_name)
+    engine_class = getattr(module, class_name)
+    return engine_class.__new__(engine_class)
+
+def messages(system: str, user: str):
+    return [{"role": "system", "content": system}, {"role": "user", "content": user}]
+
+def exact_prompts(text):
+    engine = bare("humanizer_exact", "ExactHumanizationEngine")
+    instructions = engine._chatgpt_instructions('neutral', 0.5, 0.5, 50, 0.3, 0.5)
+    return [engine._chatgpt_messages(instructions, text)]
+
+def openai_prompts(text):
+    engine = bare("humanizer_openai", "HumanizationEngine")
+    return [
+        engine._build_request(text, 'neutral', 0.5, 0.5, 0.3, 0.5, 0.7, None, None, 'editor', context)['messages']
+        for context in ("", "the end of the previous chunk")
+    ]
+
+def pro_prompts(text):
+    engine = bare("humanizer_pro", "ProHumanizationEngine")
+    first = engine._restructure_prompts(text, 'neutral', 0.5, "the end of the previous chunk")
+    second = engine._paraphrase_prompts(text, 0.5, 50)
+    return [messages(*first), messages(*second)]
+
+def ultimate_prompts(text):
+    engine = bare("humanizer_ultimate", "UltimateHumanizationEngine")
+    first = engine._rewrite_prompts(text, 'neutral', 0.5, 0.5, 0.3, "the end of the previous chunk")
+    second = engine._chaos_prompts(text)
+    return [messages(*first), messages(*second)]
+
+def advanced_prompts(text):
+    engine = bare("humanizer_advanced", "AdvancedHumanizationEngine")
+    first = engine._first_pass_prompts(text, 'neutral')
+    second = engine._second_pass_prompts(text, 0.5, 0.3, 0.5, 50)
+    return [messages(*first), messages(*second)]
+
+def pro_fused(text):
+    engine = bare("humanizer_pro", "ProHumanizationEngine")
+    return [fuse_passes(*engine._restructure_prompts(text, 'neutral', 0.5, "the end of the previous chunk"),
+                        *engine._paraphrase_prompts(PASS_ONE_RESULT, 0.5, 50))]
+
+def ultimate_fused(text):
+    engine = bare("humanizer_ultimate", "UltimateHumanizationEngine")
+    return [fuse_passes(*engine._rewrite_prompts(text, 'neutral', 0.5, 0.5, 0.3),
+                        *engine._chaos_prompts(PASS_ONE_RESULT))]
+
+def advanced_fused(text):
+    engine = bare("humanizer_advanced", "AdvancedHumanizationEngine")
+    return [fuse_passes(*engine._first_pass_prompts(text, 'neutral'),
+                        *engine._second_pass_prompts(PASS_ONE_RESULT, 0.5, 0.3, 0.5, 50))]
+
+@pytest.mark.parametrize("build", [exact_prompts, openai_prompts, pro_prompts, ultimate_prompts, advanced_prompts,
+                                   pro_fused, ultimate_fused, advanced_fused])
+def test_extracts_whole_document_from_engine_prompts(build):
+    for prompt in build(DOCUMENT):
+        assert extract_text(prompt) == DOCUMENT
+
+def test_transform_rewrites_every_paragraph():
+    rewritten = transform(DOCUMENT, "contractions")
+
+    assert rewritten.count("\n\n") == DOCUMENT.count("\n\n")
+    assert "it's clear" in rewritten
+    assert "won't reverse" in rewritten
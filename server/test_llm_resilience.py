@@ -0,0 +1,112 @@
+from functools import partial
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+import llm_client
+from llm_resilience import CircuitBreaker, CircuitOpenError, call_with_resilience
+
+def bad_request():
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    response = httpx.Response(400, request=request)
+    return openai.BadRequestError("bad request", response=response, body=None)
+
+def half_open_breaker() -> CircuitBreaker:
+    breaker = CircuitBreaker("test", min_calls=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.state == "open"
+    return breaker
+
+def test_non_retryable_probe_closes_breaker():
+    breaker = half_open_breaker()
+
+    def call():
+        raise bad_request()
+
+    with pytest.raises(openai.BadRequestError):
+        call_with_resilience(call, breaker=breaker, max_retries=0)
+
+    assert breaker.state == "closed"
+    assert call_with_resilience(lambda: "ok", breaker=breaker) == "ok"
+
+def test_local_error_releases_probe():
+    breaker = half_open_breaker()
+
+    def call():
+        raise ValueError("local bug")
+
+    with pytest.raises(ValueError):
+        call_with_resilience(call, breaker=breaker, max_retries=0)
+
+    assert breaker.state == "half_open"
+    assert not breaker.probe_in_flight
+    assert call_with_resilience(lambda: "ok", breaker=breaker) == "ok"
+    assert breaker.state == "closed"
+
+def test_second_probe_rejected_while_first_in_flight():
+    breaker = half_open_breaker()
+    assert breaker.allow()
+
+    with pytest.raises(CircuitOpenError):
+        call_with_resilience(lambda: "ok", breaker=breaker)
+
+class FakeStream:
+    def __init__(self, deltas, error=None):
+        self.deltas = deltas
+        self.error = error
+        self.closed = False
+
+    def __iter__(self):
+        for delta in self.deltas:
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=delta))])
+        if self.error:
+            raise self.error
+
+    def close(self):
+        self.closed = True
+
+def fake_client(stream):
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=lambda **params: stream)))
+
+@pytest.fixture
+def stream_breaker(monkeypatch):
+    breaker = half_open_breaker()
+    monkeypatch.setattr(llm_client, "llm_breaker", breaker)
+    monkeypatch.setattr(llm_client, "call_with_resilience", partial(call_with_resilience, breaker=breaker))
+    return breaker
+
+def stream(client):
+    return llm_client.stream_chat_completion(client, model="gpt-4o-mini", messages=[])
+
+def test_stream_records_one_success_after_consumption(stream_breaker):
+    deltas = stream(fake_client(FakeStream(["a", "b"])))
+
+    assert next(deltas) == "a"
+    # The probe is still open while the stream is being read
+    assert stream_breaker.state == "half_open"
+    assert list(deltas) == ["b"]
+    assert stream_breaker.state == "closed"
+    assert stream_breaker.calls == 2
+
+def test_stream_error_records_one_failure(stream_breaker):
+    error = openai.APIConnectionError(request=httpx.Request("POST", "https://api.openai.com"))
+
+    with pytest.raises(openai.APIConnectionError):
+        list(stream(fake_client(FakeStream(["a"], error))))
+
+    assert stream_breaker.state == "open"
+    assert stream_breaker.calls == 2
+    assert stream_breaker.failures == 2
+
+def test_abandoned_stream_releases_probe(stream_breaker):
+    fake = FakeStream(["a", "b"])
+    deltas = stream(fake_client(fake))
+    next(deltas)
+    deltas.close()
+
+    assert fake.closed
+    assert stream_breaker.state == "half_open"
+    assert not stream_breaker.probe_in_flight
+    assert stream_breaker.calls == 1
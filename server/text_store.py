@@ -0,0 +1,20 @@
+import os
+import zlib
+import hashlib
+from typing import Tuple
+
+TEXT_COMPRESSION_LEVEL = int(os.getenv("TEXT_COMPRESSION_LEVEL", "6"))
+
+# First 100 characters of the input are kept uncompressed for job lists
+PREVIEW_LENGTH = 100
+
+def compress_text(text: str) -> Tuple[str, bytes]:
+    """Digest (the blob's content address) and zlib-compressed UTF-8 bytes of a text"""
+    data = text.encode("utf-8")
+    return hashlib.sha256(data).hexdigest(), zlib.compress(data, TEXT_COMPRESSION_LEVEL)
+
+def decompress_text(data: bytes) -> str:
+    return zlib.decompress(data).decode("utf-8")
+
+def preview(text: str) -> str:
+    return text[:PREVIEW_LENGTH]
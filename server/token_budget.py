@@ -0,0 +1,156 @@
+import re
+import math
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import tiktoken
+
+# Context window and output limit per model, in tokens
+MODEL_LIMITS = {
+    'gpt-4o-mini': {'context': 128000, 'max_output': 16384},
+    'gpt-4o': {'context': 128000, 'max_output': 16384},
+    'gpt-3.5-turbo': {'context': 16385, 'max_output': 4096},
+}
+DEFAULT_LIMITS = {'context': 16385, 'max_output': 4096}
+
+# Rewrites rarely grow past 1.5x their input; the margin covers short inputs
+OUTPUT_EXPANSION = 1.5
+OUTPUT_MARGIN = 64
+MIN_OUTPUT_TOKENS = 256
+
+# Chat format overhead (per message and for priming the reply)
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_REPLY = 3
+
+@lru_cache(maxsize=8)
+def _get_encoding(model: str):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except Exception:
+        pass
+
+    # Newer models are not mapped by older tiktoken releases
+    for name in ("o200k_base", "cl100k_base"):
+        try:
+            return tiktoken.get_encoding(name)
+        except Exception:
+            continue
+
+    print(f"Tokenizer unavailable for {model}, estimating token counts")
+    return None
+
+def model_limits(model: str) -> Dict:
+    return MODEL_LIMITS.get(model, DEFAULT_LIMITS)
+
+def count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
+    """Exact token count for text under the model's tokenizer"""
+    encoding = _get_encoding(model)
+    if encoding is None:
+        # Roughly four characters per token for English prose
+        return math.ceil(len(text) / 4)
+    return len(encoding.encode(text, disallowed_special=()))
+
+def count_message_tokens(messages: List[Dict], model: str = "gpt-4o-mini") -> int:
+    """Tokens consumed by a chat prompt, including the chat format overhead"""
+    total = TOKENS_PER_REPLY
+    for message in messages:
+        total += TOKENS_PER_MESSAGE
+        for value in message.values():
+            total += count_tokens(value, model)
+    return total
+
+def budget_max_tokens(
+    messages: List[Dict],
+    text: str,
+    model: str = "gpt-4o-mini",
+    requested: Optional[int] = None,
+    expansion: float = OUTPUT_EXPANSION
+) -> int:
+    """Size max_tokens for a rewrite of text so it fits the model without over-reserving"""
+    limits = model_limits(model)
+    available = limits['context'] - count_message_tokens(messages, model)
+    ceiling = max(1, min(limits['max_output'], available))
+
+    if requested:
+        return min(requested, ceiling)
+
+    needed = math.ceil(count_tokens(text, model) * expansion) + OUTPUT_MARGIN
+    return min(max(needed, MIN_OUTPUT_TOKENS), ceiling)
+
+def chunk_token_limit(
+    prompt_tokens: int,
+    model: str = "gpt-4o-mini",
+    expansion: float = OUTPUT_EXPANSION
+) -> int:
+    """Largest chunk of text (in tokens) whose prompt and rewrite both fit the model"""
+    limits = model_limits(model)
+    by_context = (limits['context'] - prompt_tokens - OUTPUT_MARGIN) / (1 + expansion)
+    by_output = (limits['max_output'] - OUTPUT_MARGIN) / expansion
+    return max(1, int(min(by_context, by_output)))
+
+# Boundaries tried in order when a piece is too large: blank lines, line breaks, sentences, words.
+# Each is a capturing group so the original separators are kept for stitching.
+SPLIT_BOUNDARIES = [
+    re.compile(r'(\n\s*\n)'),
+    re.compile(r'([ \t]*\n\s*)'),
+    re.compile(r'(?<=[.!?])(\s+)'),
+    # Splitting on whitespace keeps placeholders such as __CITATION_0__ intact
+    re.compile(r'(\s+)'),
+]
+
+def split_text_with_separators(text: str, max_tokens: int, model: str = "gpt-4o-mini") -> Tuple[List[str], List[str]]:
+    """Split text into chunks of at most max_tokens at the coarsest boundary that fits,
+    returning the chunks and the original text between each pair of them"""
+    if count_tokens(text, model) <= max_tokens:
+        return [text], []
+
+    pieces = _split(text.strip(), max_tokens, model, 0)
+    return [chunk for chunk, _ in pieces], [separator for _, separator in pieces[:-1]]
+
+def join_chunks(chunks: List[str], separators: List[str]) -> str:
+    """Reassemble (rewritten) chunks with the separators split_text_with_separators found"""
+    return ''.join(chunk + separator for chunk, separator in zip(chunks, separators + ['']))
+
+def _split(text: str, max_tokens: int, model: str, level: int) -> List[Tuple[str, str]]:
+    # (chunk, separator after it) pairs, packing units of this level greedily
+    parts = SPLIT_BOUNDARIES[level].split(text)
+    units = list(zip(parts[0::2], parts[1::2] + ['']))
+
+    pieces = []
+    current = []
+    current_tokens = 0
+
+    def flush():
+        nonlocal current, current_tokens
+        if current:
+            chunk = ''.join(unit + separator for unit, separator in current[:-1]) + current[-1][0]
+            pieces.append((chunk, current[-1][1]))
+            current, current_tokens = [], 0
+
+    for unit, separator in units:
+        if not unit.strip():
+            # Whitespace between separators belongs to the separator before it
+            if current:
+                current[-1] = (current[-1][0], current[-1][1] + unit + separator)
+            elif pieces:
+                pieces[-1] = (pieces[-1][0], pieces[-1][1] + unit + separator)
+            continue
+
+        unit_tokens = count_tokens(unit + separator, model)
+
+        if unit_tokens > max_tokens and level + 1 < len(SPLIT_BOUNDARIES):
+            # Too large for one call: split it at the next finer boundary
+            flush()
+            split = _split(unit, max_tokens, model, level + 1)
+            split[-1] = (split[-1][0], separator)
+            pieces.extend(split)
+            continue
+
+        if current and current_tokens + unit_tokens > max_tokens:
+            flush()
+
+        current.append((unit, separator))
+        current_tokens += unit_tokens
+
+    flush()
+    return pieces